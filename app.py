@@ -1,16 +1,20 @@
 import os
-import json
+import hashlib
 import logging
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-from flask import Flask, request, render_template, redirect, url_for, flash, jsonify
+import orjson
+from flask import (Flask, Response, request, render_template, redirect, url_for, flash, jsonify,
+                   stream_with_context)
+from markupsafe import escape
 from dotenv import load_dotenv
-from logging.handlers import RotatingFileHandler
+from jinja2 import FileSystemBytecodeCache
 from werkzeug.exceptions import RequestEntityTooLarge
 
 from models.document_processor import DocumentProcessor  # Updated to use new processor
 from models.database import DatabaseManager
+from models.extraction_cache import ExtractionCache
 from models.validators import setup_logging
 
 # Load environment variables
@@ -26,6 +30,17 @@ app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("MAX_CONTENT_LENGTH", 50 * 1024
 # Create upload directory
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Persist compiled templates so restarted workers skip re-parsing them
+jinja_cache_dir = os.getenv('JINJA_CACHE_DIR', '.jinja_cache')
+os.makedirs(jinja_cache_dir, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(jinja_cache_dir)
+if not app.debug:
+    app.jinja_env.auto_reload = False
+
+# Compile every template up front so the first upload doesn't pay for it
+for template_name in app.jinja_env.list_templates():
+    app.jinja_env.get_template(template_name)
+
 # Setup logging
 setup_logging(app)
 
@@ -33,12 +48,140 @@ setup_logging(app)
 db_manager = DatabaseManager()
 doc_processor = DocumentProcessor()
 
+# Background processing is enabled when a Celery broker is configured
+if os.getenv('CELERY_BROKER_URL'):
+    from tasks import celery_app, process_pdf_task
+else:
+    celery_app = None
+    process_pdf_task = None
+
+# Rough completion percentage reported for each pipeline stage
+TASK_STAGE_PROGRESS = {'processing': 30, 'db': 90}
+
+# Uploads up to this size are processed in memory without touching UPLOAD_FOLDER
+IN_MEMORY_UPLOAD_LIMIT = int(os.getenv('IN_MEMORY_UPLOAD_LIMIT', 10 * 1024 * 1024))
+
+# Key environment variables shown on /debug_system_status, read once at startup
+STATUS_ENV_VARS = {
+    var: os.getenv(var) for var in (
+        'AZURE_OPENAI_ENDPOINT',
+        'AZURE_OPENAI_DEPLOYMENT',
+        'FORM_RECOGNIZER_ENDPOINT',
+        'SQL_SERVER',
+        'SQL_DATABASE'
+    )
+}
+
+# Rendered debug page snapshots kept (in memory only; they contain extracted personal data)
+DEBUG_PAGE_CACHE_SIZE = 32
+debug_page_cache = ExtractionCache(int(os.getenv('DEBUG_PAGE_CACHE_SIZE', DEBUG_PAGE_CACHE_SIZE)))
+
+
+def pretty_json(obj: Any) -> str:
+    """Indented, HTML-escaped JSON for a debug page <pre> block"""
+    return str(escape(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()))
+
+
+def cached_debug_page(snapshot_key: str, generate) -> Response:
+    """Serve a debug page snapshot from memory, rendering it with ``generate`` on a miss.
+
+    ``snapshot_key`` should change whenever the underlying data does. The page is joined
+    before this returns, so ``generate`` may use a connection the caller still holds.
+    """
+    page = debug_page_cache.get(snapshot_key)
+    if page is None:
+        page = ''.join(generate()).encode('utf-8')
+        debug_page_cache.set(snapshot_key, page)
+
+    response = Response(page, mimetype='text/html')
+    response.set_etag(hashlib.sha256(snapshot_key.encode()).hexdigest())
+    response.headers['Cache-Control'] = 'private, max-age=30'
+    return response.make_conditional(request)
+
+
+def find_latest_upload() -> Optional[str]:
+    """Return the path of the most recent PDF upload still on disk, or None if there is none"""
+    # Single scandir pass keeping the newest entry; DirEntry.stat() reuses the directory read on Windows
+    latest_path, latest_ctime = None, None
+    with os.scandir(app.config['UPLOAD_FOLDER']) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.pdf') or not entry.is_file():
+                continue
+            ctime = entry.stat().st_ctime
+            if latest_ctime is None or ctime > latest_ctime:
+                latest_path, latest_ctime = entry.path, ctime
+    return latest_path
+
 
 @app.route('/', methods=['GET'])
 def index():
     """Main upload page"""
     max_content_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
-    return render_template('upload.html', max_content_mb=max_content_mb)
+    return render_template('upload.html', max_content_mb=max_content_mb,
+                           async_processing=celery_app is not None)
+
+
+def process_uploaded_file(file_path, processing_mode: str, document_type: str,
+                          options: Dict[str, Any], report_stage=None,
+                          file_name: Optional[str] = None) -> Dict[str, Any]:
+    """Run the processing pipeline on an upload and store the results.
+
+    Shared by the synchronous ``/upload`` path and the Celery worker.
+    ``file_path`` is a saved upload's path or the PDF bytes kept in memory,
+    in which case ``file_name`` is recorded as the file name.
+    ``report_stage`` is called with the name of each stage as it starts.
+    """
+    if report_stage:
+        report_stage('processing')
+
+    # Process the file
+    app.logger.info("Starting file processing...")
+    if processing_mode == 'single_document':
+        results = doc_processor.process_single_document(file_path, document_type, options)
+
+        results = doc_processor.normalize_single_to_multi(results)
+
+    else:
+        results = doc_processor.process_multi_document_file(file_path, options)
+
+    app.logger.info("File processing completed")
+    if file_name:
+        results['file_path'] = file_name
+
+    if report_stage:
+        report_stage('db')
+
+    # Store results in database with detailed error handling
+    app.logger.info("Storing results in database...")
+    try:
+        processing_id = db_manager.store_processing_results(results)
+        app.logger.info(f"Results stored successfully with ID: {processing_id}")
+
+        # Update results with the processing ID for links
+        results['processing_id'] = processing_id
+
+    except Exception as db_error:
+        app.logger.error(f"Database storage failed: {str(db_error)}", exc_info=True)
+
+        # Continue to show results even if database storage fails
+        results['processing_id'] = None
+        results['db_error'] = str(db_error)
+
+    return results
+
+
+def flash_database_error(db_error: str):
+    """Flash a user-facing message for a failed results insert"""
+    # Check if it's a connection issue
+    if "Invalid object name" in db_error:
+        app.logger.error("Database tables don't exist. Please run the schema creation script.")
+        flash('Database error: Tables not found. Please contact administrator.', 'error')
+    elif "Login failed" in db_error or "Cannot open database" in db_error:
+        app.logger.error("Database connection/authentication failed")
+        flash('Database connection failed. Please contact administrator.', 'error')
+    else:
+        app.logger.error(f"Unexpected database error: {db_error}")
+        flash('Database storage failed, but processing completed. Results shown below.', 'warning')
 
 
 @app.route('/upload', methods=['POST'])
@@ -65,14 +208,11 @@ def upload_file():
             flash('Only PDF files are supported', 'error')
             return redirect(url_for('index'))
 
-        # Save uploaded file
         filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        app.logger.info(f"File saved to: {file_path}")
 
         # Get processing options
         processing_mode = request.form.get('processing_mode', 'multi_document')
+        document_type = request.form.get('document_type', 'auto')
         options = {
             'check_completeness': request.form.get('check_completeness') == 'on',
             'cross_reference': request.form.get('cross_reference') == 'on',
@@ -82,121 +222,31 @@ def upload_file():
         }
         app.logger.info(f"Processing mode: {processing_mode}, Options: {options}")
 
-        # Process the file
-        app.logger.info("Starting file processing...")
-        if processing_mode == 'single_document':
-            document_type = request.form.get('document_type', 'auto')
-            results = doc_processor.process_single_document(file_path, document_type, options)
+        # Small uploads are processed straight from memory when running synchronously
+        data = file.read()
+        if celery_app is None and len(data) <= IN_MEMORY_UPLOAD_LIMIT:
+            app.logger.info(f"Processing {len(data)} byte upload in memory")
+            results = process_uploaded_file(data, processing_mode, document_type, options,
+                                            file_name=filename)
+            if results.get('db_error'):
+                flash_database_error(results['db_error'])
+            return render_template('results.html', results=results)
 
-            # Add missing fields for single document processing to match multi-document format
-            if 'processing_summary' not in results:
-                # Create basic processing summary
-                extracted_data = results.get('extracted_data', {})
-                person_name = (
-                        extracted_data.get('beneficiary') or
-                        extracted_data.get('full_name') or
-                        extracted_data.get('holder_name') or
-                        f"{extracted_data.get('first_name', '')} {extracted_data.get('last_name', '')}".strip()
-                )
-
-                results['processing_summary'] = {
-                    'file_overview': {
-                        'total_pages': 1,  # Single document
-                        'document_types_found': {results.get('document_type', 'UNKNOWN'): 1},
-                        'people_identified': 1 if person_name else 0,
-                        'date_range': {
-                            'earliest': extracted_data.get('notice_date') or extracted_data.get('issue_date'),
-                            'latest': extracted_data.get('notice_date') or extracted_data.get('issue_date')
-                        }
-                    },
-                    'completeness_check': {},
-                    'red_flags': [],
-                    'recommendations': []
-                }
+        # Save uploaded file
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        with open(file_path, 'wb') as fd:
+            fd.write(data)
+        app.logger.info(f"File saved to: {file_path}")
 
-            # Convert single document format to match multi-document format
-            if 'documents_processed' not in results:
-                results['documents_processed'] = [{
-                    'pages': [0],  # Single document, page 0
-                    'document_type': results.get('document_type', 'UNKNOWN'),
-                    'confidence': 0.8,
-                    'extracted_data': results.get('extracted_data', {}),
-                    'validation_results': results.get('validation_results', {}),
-                    'processing_notes': results.get('processing_notes', [])
-                }]
-
-            # Create person records if not exist
-            if 'person_records' not in results:
-                results['person_records'] = {}
-                extracted_data = results.get('extracted_data', {})
-                person_name = (
-                        extracted_data.get('beneficiary') or
-                        extracted_data.get('full_name') or
-                        extracted_data.get('holder_name') or
-                        f"{extracted_data.get('first_name', '')} {extracted_data.get('last_name', '')}".strip()
-                )
-
-                if person_name:
-                    person_key = f"{person_name}_{extracted_data.get('date_of_birth', '')}"
-                    results['person_records'][person_key] = {
-                        'name': person_name,
-                        'date_of_birth': extracted_data.get('date_of_birth'),
-                        'documents': [{
-                            'type': results.get('document_type', 'UNKNOWN'),
-                            'pages': [0],
-                            'data': extracted_data
-                        }],
-                        'timeline': [],
-                        'inconsistencies': []
-                    }
-
-                    # Add timeline entry if date available
-                    doc_date = (
-                            extracted_data.get('notice_date') or
-                            extracted_data.get('issue_date') or
-                            extracted_data.get('received_date')
-                    )
-                    if doc_date:
-                        results['person_records'][person_key]['timeline'].append({
-                            'date': doc_date,
-                            'document': results.get('document_type', 'UNKNOWN'),
-                            'event': f"{results.get('document_type', 'UNKNOWN')} processed"
-                        })
-
-            # Ensure validation_errors exists
-            if 'validation_errors' not in results:
-                results['validation_errors'] = []
-
-        else:
-            results = doc_processor.process_multi_document_file(file_path, options)
-
-        app.logger.info("File processing completed")
-
-        # Store results in database with detailed error handling
-        app.logger.info("Storing results in database...")
-        try:
-            processing_id = db_manager.store_processing_results(results)
-            app.logger.info(f"Results stored successfully with ID: {processing_id}")
-
-            # Update results with the processing ID for links
-            results['processing_id'] = processing_id
-
-        except Exception as db_error:
-            app.logger.error(f"Database storage failed: {str(db_error)}", exc_info=True)
-
-            # Check if it's a connection issue
-            if "Invalid object name" in str(db_error):
-                app.logger.error("Database tables don't exist. Please run the schema creation script.")
-                flash('Database error: Tables not found. Please contact administrator.', 'error')
-            elif "Login failed" in str(db_error) or "Cannot open database" in str(db_error):
-                app.logger.error("Database connection/authentication failed")
-                flash('Database connection failed. Please contact administrator.', 'error')
-            else:
-                app.logger.error(f"Unexpected database error: {str(db_error)}")
-                flash('Database storage failed, but processing completed. Results shown below.', 'warning')
+        # Hand the file to a Celery worker when a broker is configured
+        if celery_app is not None:
+            task = process_pdf_task.delay(file_path, processing_mode, document_type, options)
+            app.logger.info(f"Queued processing task: {task.id}")
+            return jsonify({'task_id': task.id}), 202
 
-            # Continue to show results even if database storage fails
-            results['processing_id'] = None
+        results = process_uploaded_file(file_path, processing_mode, document_type, options)
+        if results.get('db_error'):
+            flash_database_error(results['db_error'])
 
         # Generate results response
         results_html = render_template('results.html', results=results)
@@ -235,8 +285,29 @@ def audit_summary(result_id):
 @app.route('/api/progress/<task_id>')
 def get_progress(task_id):
     """Get processing progress for AJAX updates"""
-    # This would integrate with a task queue like Celery for long-running processes
-    return jsonify({'progress': 100, 'status': 'complete'})
+    if celery_app is None:
+        return jsonify({'progress': 100, 'status': 'complete'})
+
+    task = celery_app.AsyncResult(task_id)
+    if task.state == 'PENDING':
+        return jsonify({'progress': 0, 'status': 'queued'})
+    if task.state == 'PROGRESS':
+        stage = (task.info or {}).get('stage')
+        return jsonify({'progress': TASK_STAGE_PROGRESS.get(stage, 10), 'status': 'processing', 'stage': stage})
+    if task.state == 'SUCCESS':
+        outcome = task.result or {}
+        processing_id = outcome.get('processing_id')
+        return jsonify({
+            'progress': 100,
+            'status': 'complete',
+            'processing_id': processing_id,
+            'redirect': url_for('audit_summary', result_id=processing_id) if processing_id else None,
+            'error': outcome.get('db_error')
+        })
+    if task.state == 'FAILURE':
+        return jsonify({'progress': 100, 'status': 'failed', 'error': str(task.info)})
+
+    return jsonify({'progress': 10, 'status': task.state.lower()})
 
 
 @app.route('/test')
@@ -268,15 +339,14 @@ def test_upload():
 def test_database():
     """Test database connectivity"""
     try:
-        # Test basic connection
         with db_manager.get_connection() as conn:
             cursor = conn.cursor()
+
+            # Test basic connection
             cursor.execute("SELECT @@VERSION")
             version = cursor.fetchone()[0]
 
-        # Test table existence
-        with db_manager.get_connection() as conn:
-            cursor = conn.cursor()
+            # Test table existence
             cursor.execute("""
                 SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES 
                 WHERE TABLE_NAME IN ('processing_sessions', 'persons', 'uscis_forms', 'dol_forms', 'i94_records', 'passports', 'visas')
@@ -323,31 +393,38 @@ def check_database_contents():
             cursor.execute("SELECT COUNT(*) FROM uscis_forms")
             uscis_count = cursor.fetchone()[0]
 
-            # Get recent processing sessions
-            cursor.execute("""
-                SELECT TOP 5 processing_id, file_name, processed_at 
-                FROM processing_sessions 
-                ORDER BY processed_at DESC
-            """)
-            recent_sessions = cursor.fetchall()
-
-            # Get recent persons
-            cursor.execute("""
-                SELECT TOP 5 person_id, name, date_of_birth, created_at 
-                FROM persons 
-                ORDER BY created_at DESC
-            """)
-            recent_persons = cursor.fetchall()
-
-            # Get recent USCIS forms
-            cursor.execute("""
-                SELECT TOP 5 person_id, receipt_number, notice_date, beneficiary, created_at 
-                FROM uscis_forms 
-                ORDER BY created_at DESC
-            """)
-            recent_uscis = cursor.fetchall()
-
-        html = f"""
+            cursor.execute("SELECT MAX(processed_at) FROM processing_sessions")
+            latest_processed_at = cursor.fetchone()[0]
+
+            snapshot_key = f"db_check|{sessions_count}|{persons_count}|{uscis_count}|{latest_processed_at}"
+
+            # Only runs on a cache miss, on this same connection (the page is rendered before it closes)
+            def generate():
+                # Get recent processing sessions
+                cursor.execute("""
+                    SELECT TOP 5 processing_id, file_name, processed_at 
+                    FROM processing_sessions 
+                    ORDER BY processed_at DESC
+                """)
+                recent_sessions = cursor.fetchall()
+
+                # Get recent persons
+                cursor.execute("""
+                    SELECT TOP 5 person_id, name, date_of_birth, created_at 
+                    FROM persons 
+                    ORDER BY created_at DESC
+                """)
+                recent_persons = cursor.fetchall()
+
+                # Get recent USCIS forms
+                cursor.execute("""
+                    SELECT TOP 5 person_id, receipt_number, notice_date, beneficiary, created_at 
+                    FROM uscis_forms 
+                    ORDER BY created_at DESC
+                """)
+                recent_uscis = cursor.fetchall()
+
+                yield f"""
         <h2>Database Contents Check</h2>
         <h3>Record Counts:</h3>
         <ul>
@@ -360,36 +437,36 @@ def check_database_contents():
         <table border="1">
             <tr><th>ID</th><th>File</th><th>Processed At</th></tr>
         """
-        for session in recent_sessions:
-            html += f"<tr><td>{session[0]}</td><td>{session[1]}</td><td>{session[2]}</td></tr>"
+                for session in recent_sessions:
+                    yield f"<tr><td>{session[0]}</td><td>{session[1]}</td><td>{session[2]}</td></tr>"
 
-        html += """
+                yield """
         </table>
 
         <h3>Recent Persons:</h3>
         <table border="1">
             <tr><th>Person ID</th><th>Name</th><th>DOB</th><th>Created At</th></tr>
         """
-        for person in recent_persons:
-            html += f"<tr><td>{person[0]}</td><td>{person[1]}</td><td>{person[2]}</td><td>{person[3]}</td></tr>"
+                for person in recent_persons:
+                    yield f"<tr><td>{person[0]}</td><td>{person[1]}</td><td>{person[2]}</td><td>{person[3]}</td></tr>"
 
-        html += """
+                yield """
         </table>
 
         <h3>Recent USCIS Forms:</h3>
         <table border="1">
             <tr><th>Person ID</th><th>Receipt Number</th><th>Notice Date</th><th>Beneficiary</th><th>Created At</th></tr>
         """
-        for uscis in recent_uscis:
-            html += f"<tr><td>{uscis[0]}</td><td>{uscis[1]}</td><td>{uscis[2]}</td><td>{uscis[3]}</td><td>{uscis[4]}</td></tr>"
+                for uscis in recent_uscis:
+                    yield f"<tr><td>{uscis[0]}</td><td>{uscis[1]}</td><td>{uscis[2]}</td><td>{uscis[3]}</td><td>{uscis[4]}</td></tr>"
 
-        html += """
+                yield """
         </table>
         <hr>
         <a href="/">Back to Upload</a>
         """
 
-        return html
+            return cached_debug_page(snapshot_key, generate)
 
     except Exception as e:
         return f"""
@@ -415,7 +492,7 @@ def debug_extraction():
 
             if result:
                 processing_id, file_name, results_json = result
-                results = json.loads(results_json)
+                results = db_manager.decode_results_json(results_json)
 
                 extracted_data = results.get('extracted_data', {})
                 person_records = results.get('person_records', {})
@@ -426,16 +503,16 @@ def debug_extraction():
                 <p><strong>Processing ID:</strong> {processing_id}</p>
 
                 <h3>Extracted Data:</h3>
-                <pre>{json.dumps(extracted_data, indent=2)}</pre>
+                <pre>{pretty_json(extracted_data)}</pre>
 
                 <h3>Person Records:</h3>
-                <pre>{json.dumps(person_records, indent=2)}</pre>
+                <pre>{pretty_json(person_records)}</pre>
 
                 <h3>Document Type:</h3>
                 <p>{results.get('document_type', 'Unknown')}</p>
 
                 <h3>Processing Notes:</h3>
-                <pre>{json.dumps(results.get('processing_notes', []), indent=2)}</pre>
+                <pre>{pretty_json(results.get('processing_notes', []))}</pre>
 
                 <hr>
                 <a href="/">Back to Upload</a>
@@ -453,21 +530,19 @@ def debug_text_extraction():
     """Debug text extraction from the latest file"""
     try:
         # Get the most recent file from uploads directory
-        upload_dir = app.config['UPLOAD_FOLDER']
-        files = [f for f in os.listdir(upload_dir) if f.endswith('.pdf')]
-
-        if not files:
+        file_path = find_latest_upload()
+        if not file_path:
             return "No PDF files found in uploads directory"
+        latest_file = os.path.basename(file_path)
 
-        # Get the most recent file
-        latest_file = max(files, key=lambda f: os.path.getctime(os.path.join(upload_dir, f)))
-        file_path = os.path.join(upload_dir, latest_file)
+        # Read once; both passes below work from the same bytes
+        pdf_bytes = doc_processor.read_pdf_bytes(file_path)
 
         # Test text extraction
-        extraction_result = doc_processor.extract_text_multi_method(file_path)
+        extraction_result = doc_processor.extract_text_multi_method(pdf_bytes)
 
         # Test document type detection
-        segments, _ = doc_processor.analyze_pdf_by_pages(file_path)
+        segments, _ = doc_processor.analyze_pdf_by_pages(pdf_bytes)
 
         html = f"""
         <h2>Text Extraction Debug</h2>
@@ -538,76 +613,75 @@ def debug_azure_openai():
 def debug_extraction_methods():
     """Debug each text extraction method separately"""
     try:
-        upload_dir = app.config['UPLOAD_FOLDER']
-        files = [f for f in os.listdir(upload_dir) if f.endswith('.pdf')]
-        if not files:
+        file_path = find_latest_upload()
+        if not file_path:
             return "No PDF files found"
+        latest_file = os.path.basename(file_path)
 
-        latest_file = max(files, key=lambda f: os.path.getctime(os.path.join(upload_dir, f)))
-        file_path = os.path.join(upload_dir, latest_file)
-
-        results = {}
+        # Read once; every method below works from the same bytes
+        pdf_bytes = doc_processor.read_pdf_bytes(file_path)
 
-        # Test PyMuPDF
-        try:
-            pymupdf_text = doc_processor.extract_text_pymupdf(file_path)
-            results['pymupdf'] = {
+        def run_pymupdf():
+            pymupdf_text = doc_processor.extract_text_pymupdf(pdf_bytes)
+            return {
                 'success': True,
                 'length': len(pymupdf_text),
                 'sample': pymupdf_text[:200] if pymupdf_text else 'NO TEXT'
             }
-        except Exception as e:
-            results['pymupdf'] = {'success': False, 'error': str(e)}
 
-        # Test Azure Form Recognizer
-        try:
-            azure_text = doc_processor.extract_text_azure(file_path)
-            results['azure'] = {
+        def run_azure():
+            azure_text = doc_processor.extract_text_azure(pdf_bytes)
+            return {
                 'success': True,
                 'length': len(azure_text),
                 'sample': azure_text[:200] if azure_text else 'NO TEXT'
             }
-        except Exception as e:
-            results['azure'] = {'success': False, 'error': str(e)}
 
-        # Test the multi-method function
-        try:
-            multi_result = doc_processor.extract_text_multi_method(file_path)
-            results['multi_method'] = {
+        def run_multi_method():
+            multi_result = doc_processor.extract_text_multi_method(pdf_bytes)
+            return {
                 'success': True,
                 'method_used': multi_result.get('method_used'),
                 'confidence': multi_result.get('confidence'),
                 'length': len(multi_result.get('text', '')),
                 'sample': multi_result.get('text', '')[:200]
             }
-        except Exception as e:
-            results['multi_method'] = {'success': False, 'error': str(e)}
 
-        html = f"""
+        methods = [('pymupdf', run_pymupdf), ('azure', run_azure), ('multi_method', run_multi_method)]
+
+        def generate():
+            yield f"""
         <h2>Text Extraction Methods Debug</h2>
         <p><strong>File:</strong> {latest_file}</p>
-        <p><strong>File exists:</strong> {os.path.exists(file_path)}</p>
-        <p><strong>File size:</strong> {os.path.getsize(file_path) if os.path.exists(file_path) else 'N/A'}</p>
+        <p><strong>File exists:</strong> True</p>
+        <p><strong>File size:</strong> {len(pdf_bytes)}</p>
         """
 
-        for method, result in results.items():
-            html += f"""
+            # Each method's section is sent as soon as that method finishes
+            for method, run in methods:
+                try:
+                    result = run()
+                except Exception as e:
+                    result = {'success': False, 'error': str(e)}
+
+                yield f"""
             <h3>{method.upper()}</h3>
             <p><strong>Success:</strong> {result.get('success', False)}</p>
             """
-            if result.get('success'):
-                html += f"""
+                if result.get('success'):
+                    yield f"""
                 <p><strong>Length:</strong> {result.get('length', 0)}</p>
                 <p><strong>Method Used:</strong> {result.get('method_used', 'N/A')}</p>
                 <p><strong>Confidence:</strong> {result.get('confidence', 'N/A')}</p>
                 <p><strong>Sample:</strong></p>
                 <pre style="background: #f5f5f5; padding: 10px;">{result.get('sample', 'NO SAMPLE')}</pre>
                 """
-            else:
-                html += f"<p><strong>Error:</strong> {result.get('error')}</p>"
+                else:
+                    yield f"<p><strong>Error:</strong> {result.get('error')}</p>"
 
-        html += '<hr><a href="/">Back to Upload</a>'
-        return html
+            yield '<hr><a href="/">Back to Upload</a>'
+
+        return Response(stream_with_context(generate()), mimetype='text/html')
 
     except Exception as e:
         return f"Debug error: {str(e)}"
@@ -617,22 +691,25 @@ def debug_extraction_methods():
 def debug_document_detection():
     """Debug document type detection on latest file"""
     try:
-        upload_dir = app.config['UPLOAD_FOLDER']
-        files = [f for f in os.listdir(upload_dir) if f.endswith('.pdf')]
-        if not files:
+        file_path = find_latest_upload()
+        if not file_path:
             return "No PDF files found"
+        latest_file = os.path.basename(file_path)
+        file_stat = os.stat(file_path)
+        snapshot_key = f"debug_document_detection|{file_path}|{file_stat.st_size}|{file_stat.st_mtime}"
 
-        latest_file = max(files, key=lambda f: os.path.getctime(os.path.join(upload_dir, f)))
-        file_path = os.path.join(upload_dir, latest_file)
+        def generate():
+            # Read once; extraction and detection work from the same bytes
+            pdf_bytes = doc_processor.read_pdf_bytes(file_path)
 
-        # Extract text and analyze
-        extraction_result = doc_processor.extract_text_multi_method(file_path)
-        text = extraction_result.get('text', '')
+            # Extract text and analyze
+            extraction_result = doc_processor.extract_text_multi_method(pdf_bytes)
+            text = extraction_result.get('text', '')
 
-        # Test document detection
-        segments, _ = doc_processor.analyze_pdf_by_pages(file_path)
+            # Test document detection
+            segments, _ = doc_processor.analyze_pdf_by_pages(pdf_bytes)
 
-        html = f"""
+            yield f"""
         <h2>Document Detection Debug</h2>
         <p><strong>File:</strong> {latest_file}</p>
         <p><strong>Text Length:</strong> {len(text)}</p>
@@ -646,8 +723,8 @@ def debug_document_detection():
         <p><strong>Segments Found:</strong> {len(segments)}</p>
         """
 
-        for i, segment in enumerate(segments):
-            html += f"""
+            for i, segment in enumerate(segments):
+                yield f"""
             <div style="border: 1px solid #ccc; margin: 10px 0; padding: 10px;">
                 <h4>Segment {i + 1}</h4>
                 <p><strong>Document Type:</strong> {segment.doc_type}</p>
@@ -660,8 +737,9 @@ def debug_document_detection():
             </div>
             """
 
-        html += '<hr><a href="/">Back to Upload</a>'
-        return html
+            yield '<hr><a href="/">Back to Upload</a>'
+
+        return cached_debug_page(snapshot_key, generate)
 
     except Exception as e:
         return f"Debug error: {str(e)}"
@@ -725,7 +803,7 @@ def debug_llm_extraction():
             html += f"""
             <h4>{doc_type} Extraction:</h4>
             <pre style="background: #f8f8f8; padding: 10px;">
-{json.dumps(result, indent=2)}
+{pretty_json(result)}
             </pre>
             """
 
@@ -786,64 +864,15 @@ def debug_system_status():
         except Exception as e:
             status['components']['upload_directory'] = {'status': 'ERROR', 'message': str(e)}
 
-        # Generate HTML report
-        html = f"""
-        <h2>System Status Report</h2>
-        <p><strong>Generated:</strong> {status['timestamp']}</p>
-
-        <table border="1" style="border-collapse: collapse; width: 100%;">
-            <tr>
-                <th style="padding: 10px;">Component</th>
-                <th style="padding: 10px;">Status</th>
-                <th style="padding: 10px;">Message</th>
-            </tr>
-        """
-
-        for component, info in status['components'].items():
-            status_color = 'green' if info['status'] == 'OK' else 'red'
-            html += f"""
-            <tr>
-                <td style="padding: 10px;">{component.replace('_', ' ').title()}</td>
-                <td style="padding: 10px; color: {status_color}; font-weight: bold;">{info['status']}</td>
-                <td style="padding: 10px;">{info['message']}</td>
-            </tr>
-            """
-
-        html += """
-        </table>
-
-        <h3>Environment Variables:</h3>
-        <ul>
-        """
-
         # Check key environment variables (without exposing secrets)
-        env_vars = [
-            'AZURE_OPENAI_ENDPOINT',
-            'AZURE_OPENAI_DEPLOYMENT',
-            'FORM_RECOGNIZER_ENDPOINT',
-            'SQL_SERVER',
-            'SQL_DATABASE'
-        ]
-
-        for var in env_vars:
-            value = os.getenv(var)
-            if value:
+        env_vars = []
+        for var, value in STATUS_ENV_VARS.items():
+            if value and 'key' in var.lower():
                 # Mask sensitive parts
-                if 'key' in var.lower():
-                    display_value = value[:8] + '...' if len(value) > 8 else '***'
-                else:
-                    display_value = value
-                html += f"<li><strong>{var}:</strong> {display_value}</li>"
-            else:
-                html += f"<li><strong>{var}:</strong> <span style='color: red;'>NOT SET</span></li>"
-
-        html += """
-        </ul>
-        <hr>
-        <a href="/">Back to Upload</a>
-        """
+                value = value[:8] + '...' if len(value) > 8 else '***'
+            env_vars.append((var, value))
 
-        return html
+        return render_template('status.html', status=status, env_vars=env_vars)
 
     except Exception as e:
         return f"System status error: {str(e)}"
@@ -0,0 +1,16 @@
+# Gunicorn settings for Linux deployments: gunicorn -c gunicorn.conf.py app:app
+# Requests OCR PDFs in-process (EasyOCR thread/process pools) and call SQL Server through pyodbc,
+# which blocks in C. Both would stall a gevent worker's hub, so the default is threaded workers:
+# each request gets a real OS thread and the Azure/DB waits still overlap.
+# GUNICORN_WORKER_CLASS=gevent only pays off once Celery (CELERY_BROKER_URL) owns OCR, and even then
+# every database call blocks the whole worker while it runs.
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Large scanned bundles can take minutes to OCR when Celery is not enabled
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 300))
@@ -1,14 +1,181 @@
 import os
+import logging
 import pyodbc
-import json
+import time
 import uuid
-from datetime import datetime
+import zlib
+import queue
+import orjson
+import functools
+import threading
+from datetime import datetime, timezone
+from collections import OrderedDict
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, List
 
 
+logger = logging.getLogger(__name__)
+
+
+INSERT_SESSION_SQL = """
+    INSERT INTO processing_sessions 
+    (processing_id, file_name, processed_at, results_json, summary_json)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+# Only sessions whose persons and documents were all written are served; a session is inserted
+# as 'processing' before its person transactions run
+SELECT_RESULTS_SQL = """
+    SELECT results_json FROM processing_sessions 
+    WHERE processing_id = ? AND status = 'completed'
+"""
+
+UPDATE_SESSION_STATUS_SQL = """
+    UPDATE processing_sessions
+    SET status = ?, error_message = ?, updated_at = ?
+    WHERE processing_id = ?
+"""
+
+# New person IDs come from the person_id_seq sequence, so they are unique across workers
+INSERT_PERSON_SQL = """
+    SET NOCOUNT ON;
+    DECLARE @person_id NVARCHAR(20) = CONCAT('FN', NEXT VALUE FOR person_id_seq);
+
+    INSERT INTO persons 
+    (person_id, name, date_of_birth, created_at, processing_id)
+    VALUES (@person_id, ?, ?, ?, ?);
+
+    SELECT @person_id;
+"""
+
+# Insert statements for document tables, in the order rows are written
+DOCUMENT_INSERTS = {
+    'uscis_forms': """
+        INSERT INTO uscis_forms 
+        (person_id, processing_id, receipt_number, notice_date, received_date, 
+         priority_date, case_type, notice_type, petitioner, beneficiary, 
+         valid_from, valid_to, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+    'dol_forms': """
+        INSERT INTO dol_forms 
+        (person_id, processing_id, case_number, case_status, 
+         determination_date, valid_from, valid_until, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+    'i94_records': """
+        INSERT INTO i94_records 
+        (person_id, processing_id, admission_record_number, arrival_date, 
+         class_of_admission, admit_until_date, port_of_entry, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+    'passports': """
+        INSERT INTO passports 
+        (person_id, processing_id, passport_number, issuing_country, 
+         issue_date, expiry_date, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+    'visas': """
+        INSERT INTO visas 
+        (person_id, processing_id, visa_number, visa_type, visa_class, 
+         issue_date, expiry_date, issuing_post, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+}
+
+
+# Tables whose rows reference persons.person_id
+PERSON_REFERENCING_TABLES = tuple(DOCUMENT_INSERTS) + ('supporting_documents', 'data_inconsistencies')
+
+# Removes what a failed session already committed, in one batch taking the processing_id once:
+# its document rows, then the persons it created that nothing references any more (another
+# session may have linked to one meanwhile), then marks the session failed
+DISCARD_SESSION_SQL = (
+    "SET NOCOUNT ON;\n"
+    "DECLARE @processing_id NVARCHAR(50) = ?, @error NVARCHAR(MAX) = ?;\n"
+    + "".join(f"DELETE FROM {table} WHERE processing_id = @processing_id;\n" for table in DOCUMENT_INSERTS)
+    + "DELETE FROM persons WHERE primary_processing_id = @processing_id"
+    + "".join(f"\n    AND NOT EXISTS (SELECT 1 FROM {table} t WHERE t.person_id = persons.person_id)"
+              for table in PERSON_REFERENCING_TABLES)
+    + ";\n"
+    "UPDATE processing_sessions SET status = 'failed', error_message = @error, updated_at = SYSUTCDATETIME()\n"
+    "WHERE processing_id = @processing_id;"
+)
+
+# Writes every queued document row in one call, one table-valued parameter per table
+# (arguments in DOCUMENT_INSERTS order; see sp_InsertDocuments in sql_schema.txt)
+INSERT_DOCUMENTS_SQL = "{CALL sp_InsertDocuments(?, ?, ?, ?, ?)}"
+
+# Target table and row builder method for each storable document type
+DOCUMENT_TYPE_TABLES = {
+    'I797': ('uscis_forms', 'uscis_document_row'),
+    'I140': ('uscis_forms', 'uscis_document_row'),
+    'PERM': ('dol_forms', 'dol_document_row'),
+    'PWD': ('dol_forms', 'dol_document_row'),
+    'I94': ('i94_records', 'i94_document_row'),
+    'US_PASSPORT': ('passports', 'passport_document_row'),
+    'FOREIGN_PASSPORT': ('passports', 'passport_document_row'),
+    'VISA_STAMP': ('visas', 'visa_document_row'),
+}
+
+# Find a person by name (and DOB when one was extracted) or insert them, returning person_id.
+# A plain lookup + INSERT is used rather than MERGE ... OUTPUT because persons has an
+# update trigger, which rules out OUTPUT without INTO.
+UPSERT_PERSON_SQL = """
+    SET NOCOUNT ON;
+    DECLARE @name NVARCHAR(255) = ?, @any_dob BIT = ?, @dob DATE = ?, @person_id NVARCHAR(20);
+
+    SELECT TOP 1 @person_id = person_id
+    FROM persons WITH (UPDLOCK, HOLDLOCK)
+    WHERE name = @name AND (@any_dob = 1 OR date_of_birth = @dob);
+
+    IF @person_id IS NULL
+    BEGIN
+        SET @person_id = CONCAT('FN', NEXT VALUE FOR person_id_seq);
+        INSERT INTO persons 
+        (person_id, name, date_of_birth, created_at, processing_id)
+        VALUES (@person_id, ?, ?, ?, ?);
+    END
+
+    SELECT @person_id;
+"""
+
+# Non-ISO formats tried by parse_date_cached after the fromisoformat fast path
+DATE_FORMATS = ("%m/%d/%Y", "%d-%b-%Y", "%d %B %Y", "%B %d %Y")
+
+# Extracted field values that has_meaningful_data treats as empty
+EMPTY_VALUES = (None, "", "null")
+
+# Idle connections kept open for reuse by get_connection
+DB_POOL_SIZE = 5
+
+# Connections opened (and validated) up front by setup_connection
+DB_POOL_MIN_SIZE = 1
+
+# Pooled connections idle longer than this are checked with SELECT 1 before reuse
+DB_POOL_RECYCLE_SECONDS = 300
+
+# Login timeout for new connections
+DB_CONNECT_TIMEOUT = 15
+
+# Person IDs remembered per process by (name, DOB) so repeat lookups skip the database
+PERSON_ID_CACHE_SIZE = 10_000
+
+
 class DatabaseManager:
     def __init__(self):
+        # Settings are read from the environment once, here, rather than per connection
+        self.connect_timeout = int(os.getenv('DB_CONNECT_TIMEOUT', DB_CONNECT_TIMEOUT))
+        self.pool_min_size = int(os.getenv('DB_POOL_MIN_SIZE', DB_POOL_MIN_SIZE))
+        self.use_document_tvp = os.getenv('DB_DOCUMENT_TVP', 'False').lower() == 'true'
+
+        # (name, has_dob, parsed_dob) -> person_id for persons already stored by this process
+        self._person_ids: OrderedDict = OrderedDict()
+        self._person_ids_lock = threading.Lock()
+
+        # Holds (connection, returned_at) pairs
+        self._pool = queue.LifoQueue(maxsize=int(os.getenv('DB_POOL_SIZE', DB_POOL_SIZE)))
         self.setup_connection()
 
     def setup_connection(self):
@@ -20,304 +187,356 @@ class DatabaseManager:
             f"Trusted_Connection=yes"
         )
 
-        # Test connection
+        # Test connection and warm the pool
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT 1")
-                print("Database connection successful")
+            min_size = min(self.pool_min_size, self._pool.maxsize)
+            for _ in range(max(min_size, 1)):
+                conn = self.connect()
+                conn.cursor().execute("SELECT 1")
+                self._pool.put_nowait((conn, time.monotonic()))
+            logger.info("Database connection successful")
         except Exception as e:
-            print(f"Database connection error: {e}")
+            logger.error("Database connection error: %s", e)
+
+    def connect(self):
+        """Open a new database connection"""
+        return pyodbc.connect(self.conn_str, timeout=self.connect_timeout)
+
+    def borrow_connection(self):
+        """Take an idle pooled connection (reconnecting if it went stale), or open a new one"""
+        try:
+            conn, returned_at = self._pool.get_nowait()
+        except queue.Empty:
+            return self.connect()
+
+        if time.monotonic() - returned_at > DB_POOL_RECYCLE_SECONDS:
+            try:
+                conn.cursor().execute("SELECT 1")
+            except pyodbc.Error:
+                logger.debug("Evicting stale pooled connection")
+                try:
+                    conn.close()
+                except pyodbc.Error:
+                    pass
+                return self.connect()
+        return conn
 
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections"""
-        conn = pyodbc.connect(self.conn_str)
+        """Context manager that borrows a pooled database connection and returns it afterwards"""
+        conn = self.borrow_connection()
+
         try:
             yield conn
-        finally:
+        except Exception:
+            # The connection may be broken; don't hand it to the next caller
+            conn.close()
+            raise
+
+        try:
+            conn.rollback()  # discard anything the caller left uncommitted
+            self._pool.put_nowait((conn, time.monotonic()))
+        except (queue.Full, pyodbc.Error):
             conn.close()
 
     @contextmanager
     def transaction(self):
         """Context manager for database transactions"""
         with self.get_connection() as conn:
+            conn.autocommit = False
             cursor = conn.cursor()
             try:
                 yield cursor
                 conn.commit()
-                print("Transaction committed successfully")
+                logger.debug("Transaction committed successfully")
             except Exception as e:
                 conn.rollback()
-                print(f"Transaction rolled back due to error: {e}")
+                logger.warning("Transaction rolled back due to error: %s", e)
                 raise e
             finally:
                 cursor.close()
 
     def store_processing_results(self, results: Dict[str, Any]) -> str:
         """Store complete processing results"""
-        processing_id = results.get('processing_id', str(uuid.uuid4()))
-
-        print(f"DEBUG: Starting to store processing results for ID: {processing_id}")
-        print(f"DEBUG: Results keys: {list(results.keys())}")
-        print(f"DEBUG: Person records count: {len(results.get('person_records', {}))}")
-        print(f"DEBUG: Documents processed count: {len(results.get('documents_processed', []))}")
+        processing_id = results.get('processing_id', uuid.uuid4().hex)
+
+        # Guarded so the argument lists aren't built when DEBUG logging is off
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Starting to store processing results for ID: %s", processing_id)
+            logger.debug("Results keys: %s", list(results.keys()))
+            logger.debug("Person records count: %s", len(results.get('person_records', {})))
+            logger.debug("Documents processed count: %s", len(results.get('documents_processed', [])))
+
+        # Drop documents without meaningful data up front so the transactions only cover real writes
+        person_records = results.get('person_records', {})
+        documents_to_write = {
+            person_key: [doc for doc in person_data.get('documents', [])
+                         if self.has_meaningful_data(doc.get('data', {}))]
+            for person_key, person_data in person_records.items()
+        }
+        # One timestamp for every row in the session; DATETIME2 columns hold naive UTC
+        created_at = datetime.now(timezone.utc).replace(tzinfo=None)
 
         try:
             with self.transaction() as cursor:
                 # Store processing session
-                print("DEBUG: Storing processing session...")
+                logger.debug("Storing processing session...")
                 processed_at = datetime.fromisoformat(results.get('processed_at').replace('Z', '+00:00'))
+                if processed_at.tzinfo is not None:
+                    # DATETIME2 holds naive UTC
+                    processed_at = processed_at.astimezone(timezone.utc).replace(tzinfo=None)
 
-                cursor.execute("""
-                    INSERT INTO processing_sessions 
-                    (processing_id, file_name, processed_at, results_json, summary_json)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    processing_id,
-                    results.get('file_path'),
-                    processed_at,
-                    json.dumps(results),
-                    json.dumps(results.get('processing_summary', {}))
-                ))
-                print("DEBUG: Processing session stored successfully")
-
-                # Store person records
-                person_count = 0
-                for person_key, person_data in results.get('person_records', {}).items():
-                    print(f"DEBUG: Processing person: {person_key}")
-                    print(f"DEBUG: Person data: {person_data}")
-
-                    person_id = self.store_or_update_person(cursor, person_data, processing_id)
-                    print(f"DEBUG: Person stored with ID: {person_id}")
-                    person_count += 1
-
-                    # Store documents for this person
-                    doc_count = 0
-                    for doc in person_data.get('documents', []):
-                        print(f"DEBUG: Storing document type: {doc.get('type')}")
-                        print(f"DEBUG: Document data keys: {list(doc.get('data', {}).keys())}")
-
-                        self.store_document(cursor, doc, person_id, processing_id)
-                        doc_count += 1
-                        print(f"DEBUG: Document {doc_count} stored successfully")
-
-                print(f"DEBUG: Successfully stored {person_count} persons and their documents")
+                # Bind the payloads as (MAX) types so the driver streams them; input sizes stick
+                # to a cursor, so use a separate one inside the same transaction
+                session_cursor = cursor.connection.cursor()
+                try:
+                    session_cursor.setinputsizes([
+                        None, None, None,
+                        (pyodbc.SQL_VARBINARY, 0, 0),
+                        (pyodbc.SQL_WVARCHAR, 0, 0)
+                    ])
+                    session_cursor.execute(INSERT_SESSION_SQL, (
+                        processing_id,
+                        results.get('file_path'),
+                        processed_at,
+                        self.encode_results_json(results),
+                        orjson.dumps(results.get('processing_summary', {}), option=orjson.OPT_NON_STR_KEYS).decode()
+                    ))
+                finally:
+                    session_cursor.close()
+                logger.debug("Processing session stored successfully")
+
+            # Records with the same name can resolve to one person row (the upsert matches any DOB
+            # when a record has none), so they are written in document order by a single worker;
+            # only distinct names run concurrently, each transaction on its own pooled connection
+            name_groups: Dict[Any, List[tuple]] = {}
+            for index, (person_key, person_data) in enumerate(person_records.items()):
+                # Unnamed persons are always inserted as new, so each is a group of its own
+                group_key = person_data.get('name') or ('unnamed', index)
+                name_groups.setdefault(group_key, []).append((person_key, person_data))
+            groups = list(name_groups.values())
+
+            def store_group(group):
+                person_ids = []
+                for person_key, person_data in group:
+                    logger.debug("Processing person: %s", person_key)
+                    person_ids.append(self.store_person_and_documents(
+                        person_data, documents_to_write[person_key], processing_id, created_at
+                    ))
+                return person_ids
+
+            try:
+                if len(groups) > 1:
+                    # maxsize 0 means an unbounded pool: one connection per name
+                    workers = min(len(groups), self._pool.maxsize or len(groups))
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        person_ids = [pid for ids in executor.map(store_group, groups) for pid in ids]
+                else:
+                    person_ids = [pid for group in groups for pid in store_group(group)]
+                logger.debug("Successfully stored %s persons and their documents", len(person_ids))
+                self.set_session_status(processing_id, 'completed')
+            except Exception as e:
+                # The session row and some persons are already committed; remove what was written
+                self.discard_session(processing_id, str(e))
+                raise
 
         except Exception as e:
-            print(f"DEBUG: Error in store_processing_results: {str(e)}")
-            print(f"DEBUG: Error type: {type(e)}")
+            logger.error("Error in store_processing_results: %s", e)
+            logger.error("Error type: %s", type(e))
             raise e
 
         return processing_id
 
-    def store_or_update_person(self, cursor, person_data: Dict, processing_id: str) -> str:
-        """Store or update person record"""
-        print(f"DEBUG: Looking for existing person: {person_data.get('name')}, DOB: {person_data.get('date_of_birth')}")
-
-        person_id = self.find_existing_person(
-            cursor,
-            person_data.get('name'),
-            person_data.get('date_of_birth')
-        )
-
-        if not person_id:
-            person_id = self.generate_person_id()
-            print(f"DEBUG: Creating new person with ID: {person_id}")
-
-            cursor.execute("""
-                INSERT INTO persons 
-                (person_id, name, date_of_birth, created_at, processing_id)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                person_id,
-                person_data.get('name'),
-                self.parse_date(person_data.get('date_of_birth')),
-                datetime.utcnow(),
-                processing_id
+    def set_session_status(self, processing_id: str, status: str, error_message: Optional[str] = None):
+        """Record a session's final status"""
+        with self.transaction() as cursor:
+            cursor.execute(UPDATE_SESSION_STATUS_SQL, (
+                status, error_message, datetime.now(timezone.utc).replace(tzinfo=None), processing_id
             ))
-            print(f"DEBUG: New person inserted successfully")
-        else:
-            print(f"DEBUG: Found existing person with ID: {person_id}")
 
+    def discard_session(self, processing_id: str, error_message: str):
+        """Delete the rows a failed session committed and mark it failed.
+
+        Errors here are logged rather than raised so the original failure propagates; the session
+        then stays 'processing', which is never served either.
+        """
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(DISCARD_SESSION_SQL, (processing_id, error_message))
+        except Exception as e:
+            logger.error("Could not discard rows of failed session %s: %s", processing_id, e)
+        finally:
+            # Cached IDs may name persons that were just deleted
+            with self._person_ids_lock:
+                self._person_ids.clear()
+
+    def store_person_and_documents(self, person_data: Dict, documents: List[Dict], processing_id: str,
+                                   created_at: datetime) -> str:
+        """Store one person and their documents in a transaction of their own"""
+        cache_key = self.person_cache_key(person_data)
+        person_id = self.cached_person_id(cache_key)
+
+        with self.transaction() as cursor:
+            if person_id is None:
+                person_id = self.store_or_update_person(cursor, person_data, processing_id, created_at)
+
+            # Document rows are collected and written per table afterwards
+            document_rows: Dict[str, List[tuple]] = {}
+            for doc in documents:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Storing document type: %s", doc.get('type'))
+                    logger.debug("Document data keys: %s", list(doc.get('data', {}).keys()))
+                self.store_document(doc, person_id, processing_id, document_rows, created_at)
+
+            self.insert_document_rows(cursor, document_rows)
+
+        # Only remembered once committed, so a rolled-back insert is never reused
+        self.remember_person_id(cache_key, person_id)
         return person_id
 
-    def find_existing_person(self, cursor, name: str, dob: str) -> Optional[str]:
-        """Find existing person by name and DOB"""
+    def person_cache_key(self, person_data: Dict) -> Optional[tuple]:
+        """Key for the person ID cache, or None for unnamed persons (always inserted as new)"""
+        name = person_data.get('name')
         if not name:
-            print("DEBUG: No name provided for person lookup")
             return None
+        dob = person_data.get('date_of_birth')
+        return name, bool(dob), self.parse_date(dob)
 
-        print(f"DEBUG: Searching for person: name='{name}', dob='{dob}'")
+    def cached_person_id(self, cache_key: Optional[tuple]) -> Optional[str]:
+        """Return a person ID this process already stored for the key, if any"""
+        if cache_key is None:
+            return None
+        with self._person_ids_lock:
+            person_id = self._person_ids.get(cache_key)
+            if person_id is not None:
+                self._person_ids.move_to_end(cache_key)
+        if person_id is not None:
+            logger.debug("Person ID cache hit: %s", person_id)
+        return person_id
+
+    def remember_person_id(self, cache_key: Optional[tuple], person_id: str):
+        """Record a stored person's ID, dropping the least recently used entry when full"""
+        if cache_key is None:
+            return
+        with self._person_ids_lock:
+            self._person_ids[cache_key] = person_id
+            self._person_ids.move_to_end(cache_key)
+            if len(self._person_ids) > PERSON_ID_CACHE_SIZE:
+                self._person_ids.popitem(last=False)
+
+    def store_or_update_person(self, cursor, person_data: Dict, processing_id: str,
+                               created_at: Optional[datetime] = None) -> str:
+        """Return the matching person's ID, inserting a new person if there is none (one round trip)"""
+        name = person_data.get('name')
+        dob = person_data.get('date_of_birth')
+        logger.debug("Looking for existing person: %s, DOB: %s", name, dob)
+
+        parsed_dob = self.parse_date(dob)
+        values = (name, parsed_dob, created_at or datetime.now(timezone.utc).replace(tzinfo=None), processing_id)
 
-        if dob:
-            parsed_dob = self.parse_date(dob)
-            print(f"DEBUG: Parsed DOB: {parsed_dob}")
-            cursor.execute(
-                "SELECT person_id FROM persons WHERE name=? AND date_of_birth=?",
-                (name, parsed_dob)
-            )
+        if not name:
+            logger.debug("No name provided for person lookup, creating new person")
+            cursor.execute(INSERT_PERSON_SQL, values)
         else:
-            cursor.execute(
-                "SELECT TOP 1 person_id FROM persons WHERE name=?",
-                (name,)
-            )
-
-        result = cursor.fetchone()
-        found_id = result[0] if result else None
-        print(f"DEBUG: Person lookup result: {found_id}")
-        return found_id
-
-    def store_document(self, cursor, doc_data: Dict, person_id: str, processing_id: str):
-        """Store document based on type"""
+            # Without a DOB any person with the same name matches, as before
+            cursor.execute(UPSERT_PERSON_SQL, (name, 0 if dob else 1, parsed_dob) + values)
+
+        person_id = cursor.fetchone()[0]
+        logger.debug("Person stored with ID: %s", person_id)
+        return person_id
+
+    def store_document(self, doc_data: Dict, person_id: str, processing_id: str,
+                       rows: Dict[str, List[tuple]], created_at: datetime):
+        """Queue a document row for its table based on type (written later by insert_document_rows)"""
         doc_type = doc_data.get('type')
         extracted_data = doc_data.get('data', {})
 
-        print(f"DEBUG: Storing document type: {doc_type}")
-        print(f"DEBUG: Extracted data: {extracted_data}")
-
-        if doc_type in ['I797', 'I140']:
-            print("DEBUG: Storing as USCIS document")
-            self.store_uscis_document(cursor, extracted_data, person_id, processing_id)
-        elif doc_type in ['PERM', 'PWD']:
-            print("DEBUG: Storing as DOL document")
-            self.store_dol_document(cursor, extracted_data, person_id, processing_id)
-        elif doc_type == 'I94':
-            print("DEBUG: Storing as I94 document")
-            self.store_i94_document(cursor, extracted_data, person_id, processing_id)
-        elif doc_type in ['US_PASSPORT', 'FOREIGN_PASSPORT']:
-            print("DEBUG: Storing as passport document")
-            self.store_passport_document(cursor, extracted_data, person_id, processing_id)
-        elif doc_type == 'VISA_STAMP':
-            print("DEBUG: Storing as visa document")
-            self.store_visa_document(cursor, extracted_data, person_id, processing_id)
-        else:
-            print(f"DEBUG: Unknown document type: {doc_type}, skipping storage")
+        logger.debug("Storing document type: %s", doc_type)
+        logger.debug("Extracted data: %s", extracted_data)
 
-    def store_uscis_document(self, cursor, data: Dict, person_id: str, processing_id: str):
-        """Store USCIS document"""
-        print(f"DEBUG: USCIS document data: {data}")
+        if doc_type not in DOCUMENT_TYPE_TABLES:
+            logger.debug("Unknown document type: %s, skipping storage", doc_type)
+            return
+        table, row_builder = DOCUMENT_TYPE_TABLES[doc_type]
+
+        logger.debug("Queueing %s document for %s", doc_type, table)
+        rows.setdefault(table, []).append(getattr(self, row_builder)(extracted_data, person_id, processing_id, created_at))
 
-        if not self.has_meaningful_data(data):
-            print("DEBUG: No meaningful data in USCIS document, skipping")
+    def insert_document_rows(self, cursor, rows: Dict[str, List[tuple]]):
+        """Write queued document rows, via sp_InsertDocuments when enabled, else one executemany per table"""
+        if self.use_document_tvp:
+            if rows:
+                cursor.execute(INSERT_DOCUMENTS_SQL, [rows.get(table, []) for table in DOCUMENT_INSERTS])
+                logger.debug("Inserted document rows for %s tables in one call", len(rows))
             return
 
-        # Parse dates
-        notice_date = self.parse_date(data.get('notice_date'))
-        received_date = self.parse_date(data.get('received_date'))
-        priority_date = self.parse_date(data.get('priority_date'))
-        valid_from = self.parse_date(data.get('valid_from'))
-        valid_to = self.parse_date(data.get('valid_to'))
-
-        print(f"DEBUG: Parsed dates - notice: {notice_date}, received: {received_date}, priority: {priority_date}")
-
-        cursor.execute("""
-            INSERT INTO uscis_forms 
-            (person_id, processing_id, receipt_number, notice_date, received_date, 
-             priority_date, case_type, notice_type, petitioner, beneficiary, 
-             valid_from, valid_to, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        cursor.fast_executemany = True
+        for table, sql in DOCUMENT_INSERTS.items():
+            table_rows = rows.get(table)
+            if table_rows:
+                cursor.executemany(sql, table_rows)
+                logger.debug("Inserted %s rows into %s", len(table_rows), table)
+
+    def uscis_document_row(self, data: Dict, person_id: str, processing_id: str,
+                           created_at: datetime) -> tuple:
+        """Build a uscis_forms row"""
+        return (
             person_id, processing_id,
             data.get('receipt_number'),
-            notice_date,
-            received_date,
-            priority_date,
+            self.parse_date(data.get('notice_date')),
+            self.parse_date(data.get('received_date')),
+            self.parse_date(data.get('priority_date')),
             data.get('case_type'),
             data.get('notice_type'),
             data.get('petitioner'),
             data.get('beneficiary'),
-            valid_from,
-            valid_to,
-            datetime.utcnow()
-        ))
-        print("DEBUG: USCIS document stored successfully")
-
-    def store_dol_document(self, cursor, data: Dict, person_id: str, processing_id: str):
-        """Store DOL document"""
-        print(f"DEBUG: DOL document data: {data}")
-
-        if not self.has_meaningful_data(data):
-            print("DEBUG: No meaningful data in DOL document, skipping")
-            return
+            self.parse_date(data.get('valid_from')),
+            self.parse_date(data.get('valid_to')),
+            created_at
+        )
 
-        cursor.execute("""
-            INSERT INTO dol_forms 
-            (person_id, processing_id, case_number, case_status, 
-             determination_date, valid_from, valid_until, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+    def dol_document_row(self, data: Dict, person_id: str, processing_id: str,
+                         created_at: datetime) -> tuple:
+        """Build a dol_forms row"""
+        return (
             person_id, processing_id,
             data.get('case_number'),
             data.get('case_status'),
             self.parse_date(data.get('determination_date')),
             self.parse_date(data.get('valid_from')),
             self.parse_date(data.get('valid_until')),
-            datetime.utcnow()
-        ))
-        print("DEBUG: DOL document stored successfully")
-
-    def store_i94_document(self, cursor, data: Dict, person_id: str, processing_id: str):
-        """Store I-94 document"""
-        print(f"DEBUG: I94 document data: {data}")
-
-        if not self.has_meaningful_data(data):
-            print("DEBUG: No meaningful data in I94 document, skipping")
-            return
+            created_at
+        )
 
-        cursor.execute("""
-            INSERT INTO i94_records 
-            (person_id, processing_id, admission_record_number, arrival_date, 
-             class_of_admission, admit_until_date, port_of_entry, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+    def i94_document_row(self, data: Dict, person_id: str, processing_id: str,
+                         created_at: datetime) -> tuple:
+        """Build an i94_records row"""
+        return (
             person_id, processing_id,
             data.get('admission_record_number'),
             self.parse_date(data.get('arrival_date')),
             data.get('class_of_admission'),
             self.parse_date(data.get('admit_until_date')),
             data.get('port_of_entry'),
-            datetime.utcnow()
-        ))
-        print("DEBUG: I94 document stored successfully")
-
-    def store_passport_document(self, cursor, data: Dict, person_id: str, processing_id: str):
-        """Store passport document"""
-        print(f"DEBUG: Passport document data: {data}")
-
-        if not self.has_meaningful_data(data):
-            print("DEBUG: No meaningful data in passport document, skipping")
-            return
+            created_at
+        )
 
-        cursor.execute("""
-            INSERT INTO passports 
-            (person_id, processing_id, passport_number, issuing_country, 
-             issue_date, expiry_date, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
+    def passport_document_row(self, data: Dict, person_id: str, processing_id: str,
+                              created_at: datetime) -> tuple:
+        """Build a passports row"""
+        return (
             person_id, processing_id,
             data.get('passport_number'),
             data.get('issuing_country'),
             self.parse_date(data.get('issue_date')),
             self.parse_date(data.get('expiry_date')),
-            datetime.utcnow()
-        ))
-        print("DEBUG: Passport document stored successfully")
-
-    def store_visa_document(self, cursor, data: Dict, person_id: str, processing_id: str):
-        """Store visa document"""
-        print(f"DEBUG: Visa document data: {data}")
-
-        if not self.has_meaningful_data(data):
-            print("DEBUG: No meaningful data in visa document, skipping")
-            return
+            created_at
+        )
 
-        cursor.execute("""
-            INSERT INTO visas 
-            (person_id, processing_id, visa_number, visa_type, visa_class, 
-             issue_date, expiry_date, issuing_post, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+    def visa_document_row(self, data: Dict, person_id: str, processing_id: str,
+                          created_at: datetime) -> tuple:
+        """Build a visas row"""
+        return (
             person_id, processing_id,
             data.get('visa_number'),
             data.get('visa_type'),
@@ -325,58 +544,70 @@ class DatabaseManager:
             self.parse_date(data.get('issue_date')),
             self.parse_date(data.get('expiry_date')),
             data.get('issuing_post'),
-            datetime.utcnow()
-        ))
-        print("DEBUG: Visa document stored successfully")
+            created_at
+        )
 
     def get_processing_results(self, processing_id: str) -> Optional[Dict]:
         """Retrieve processing results by ID"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT results_json FROM processing_sessions 
-                WHERE processing_id = ?
-            """, (processing_id,))
+            cursor.execute(SELECT_RESULTS_SQL, (processing_id,))
 
             result = cursor.fetchone()
             if result:
-                return json.loads(result[0])
+                return self.decode_results_json(result[0])
             return None
 
-    def generate_person_id(self) -> str:
-        """Generate unique person ID"""
-        return "FN" + str(uuid.uuid4())[:6].upper()
-
-    def parse_date(self, date_str: str) -> Optional[datetime]:
-        """Parse date string to datetime object"""
-        if not date_str or date_str == 'null':
-            return None
+    def encode_results_json(self, results: Dict[str, Any]) -> bytes:
+        """Serialize results for processing_sessions.results_json (zlib-compressed JSON)"""
+        return zlib.compress(orjson.dumps(results, option=orjson.OPT_NON_STR_KEYS), 6)
 
+    def decode_results_json(self, value) -> Dict[str, Any]:
+        """Inverse of encode_results_json; also reads rows stored before compression"""
+        if isinstance(value, str):
+            return orjson.loads(value)
         try:
-            # Try various date formats
-            formats = [
-                "%Y-%m-%d", "%m/%d/%Y", "%d-%b-%Y",
-                "%d %B %Y", "%B %d %Y", "%Y-%m-%dT%H:%M:%S.%fZ",
-                "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"
-            ]
-
-            for fmt in formats:
-                try:
-                    parsed = datetime.strptime(date_str, fmt)
-                    print(f"DEBUG: Successfully parsed date '{date_str}' using format '{fmt}' -> {parsed}")
-                    return parsed
-                except ValueError:
-                    continue
+            return orjson.loads(zlib.decompress(value))
+        except zlib.error:
+            # NTEXT rows converted by the migration in sql_schema.txt are UTF-16 JSON
+            return orjson.loads(bytes(value).decode('utf-16-le'))
 
-            print(f"DEBUG: Could not parse date: '{date_str}'")
-            return None
-        except Exception as e:
-            print(f"DEBUG: Error parsing date '{date_str}': {e}")
+    def parse_date(self, date_str: str) -> Optional[datetime]:
+        """Parse date string to datetime object"""
+        if not isinstance(date_str, str):
             return None
+        return parse_date_cached(date_str)
 
     def has_meaningful_data(self, data: Dict) -> bool:
         """Check if data dict has meaningful values"""
-        meaningful = any(v is not None and v != "" and v != "null" for v in data.values())
-        print(f"DEBUG: Data has meaningful content: {meaningful}")
-        print(f"DEBUG: Data values: {list(data.values())}")
-        return meaningful
\ No newline at end of file
+        meaningful = any(v not in EMPTY_VALUES for v in data.values())
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Data has meaningful content: %s", meaningful)
+            logger.debug("Data values: %s", list(data.values()))
+        return meaningful
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_date_cached(date_str: str) -> Optional[datetime]:
+    """Parse a date string, trying ISO 8601 first; results are memoised per string"""
+    if not date_str or date_str == 'null':
+        return None
+
+    # C fast path for %Y-%m-%d, %Y-%m-%dT%H:%M:%S[.%f][Z] and %Y-%m-%d %H:%M:%S
+    try:
+        parsed = datetime.fromisoformat(date_str.rstrip('Z'))
+        if parsed.tzinfo is None:
+            return parsed
+    except ValueError:
+        pass
+
+    for fmt in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(date_str, fmt)
+            logger.debug("Successfully parsed date '%s' using format '%s' -> %s", date_str, fmt, parsed)
+            return parsed
+        except ValueError:
+            continue
+
+    logger.debug("Could not parse date: '%s'", date_str)
+    return None
@@ -3,41 +3,275 @@
 
 import os
 import re
+import sys
 import time
 import uuid
-import json
+import hashlib
+import functools
 import logging
-from datetime import datetime, date
-from typing import List, Dict, Tuple, Optional, Any
+import queue
+import threading
+import unicodedata
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, date, timezone
+from typing import List, Dict, Tuple, Optional, Any, Union
 
 import fitz  # PyMuPDF
 import easyocr
 import numpy as np
-from pdf2image import convert_from_path
+import orjson
 from azure.ai.formrecognizer import DocumentAnalysisClient
 from azure.core.credentials import AzureKeyCredential
 from openai import AzureOpenAI
 from ratelimit import limits, sleep_and_retry
 
+try:
+    import ahocorasick
+except ImportError:  # optional; keyword detection falls back to substring checks
+    ahocorasick = None
+
+from .local_cache import SQLiteCache
+from .extraction_cache import ExtractionCache
 from .validators import *
 
 
 logger = logging.getLogger(__name__)
 
+# Pages with less embedded text than this are sent to OCR
+MIN_PAGE_TEXT_LENGTH = 20
+
+# Born-digital PDFs with at least this much embedded text per page skip OCR entirely
+BORN_DIGITAL_MIN_CHARS_PER_PAGE = 100
+
+# Detection patterns, compiled once at import rather than looked up per page
+RE_RECEIPT_NUMBER = re.compile(r'receipt number.*[A-Z]{3}\d{10}', re.IGNORECASE)
+RE_I94 = re.compile(r'i[-\s]?94')
+RE_USCIS_NUMBER = re.compile(r'uscis number.*[A-Z0-9]{9,}', re.IGNORECASE)
+RE_USCIS_ID = re.compile(r'uscis.*[A-Z0-9]{9,}', re.IGNORECASE)
+RE_US_PASSPORT = re.compile(r'passport.*united states|type.*p\b', re.IGNORECASE)
+# Continuation markers, matched against lowercased text. Plain phrases are substring checks;
+# only "page N" (which also covers "page N of M") needs a regex.
+CONTINUATION_MARKERS = ('continued', 'attachment', 'exhibit')
+RE_PAGE_NUMBER = re.compile(r'page \d+')
+
+# A page mentioning none of these has no form header and is treated as a continuation
+HEADER_INDICATORS = ('form', 'department', 'certificate', 'notice')
+
+# Highest confidence any detection rule assigns. Detections are ranked by confidence and ties
+# keep check order, so once a page reaches it no later check can change the top result.
+EARLY_EXIT_CONFIDENCE = 0.95
+
+# Lowercase phrases checked by detect_document_types_on_page (matched as substrings)
+DETECTION_KEYWORDS = (
+    'notice of action', 'i-797', '1-797', 'i-797c', '1-797c', 'uscis',
+    'department of homeland security', 'u.s. citizenship and immigration services',
+    'approval notice', 'approval', 'i-140', 'i-129', 'receipt', 'receipt notice', 'receipt number',
+    'petition for a nonimmigrant worker', 'labor certification', 'form 9089', 'perm',
+    'prevailing wage', 'form 9141', 'pwd', 'eta-9035', 'eta 9035', 'labor condition application',
+    'lca', 'form 9035', 'department of labor', 'arrival departure', 'admission number',
+    'employment authorization', 'ead', 'work permit', 'i-766', 'permanent resident card',
+    'green card', 'i-551', 'passport', 'visa', 'embassy', 'consulate', 'immigrant', 'nonimmigrant',
+)
+
+
+def build_keyword_automaton(keywords: Tuple[str, ...]):
+    """Aho-Corasick automaton over ``keywords`` (None when pyahocorasick isn't installed)"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+
+KEYWORD_AUTOMATON = build_keyword_automaton(DETECTION_KEYWORDS)
+
+# Resolution scanned pages are rendered at for OCR during multi-document analysis
+OCR_RENDER_DPI = 150
+
+# Resolution extract_text_easyocr renders whole documents at (pdf2image's default, used previously)
+EASYOCR_RENDER_DPI = 200
+
+# Runs of at least this many same-sized page images are OCR'd with readtext_batched
+OCR_BATCH_MIN_PAGES = 15
+OCR_BATCH_SIZE = 16
+
+# Chunks of rendered page images allowed to wait for OCR (bounds memory while rendering ahead)
+RENDER_QUEUE_CHUNKS = 2
+
+# EasyOCR reader of an OCR worker process (see OCR_PROCESSES), loaded once per process
+_worker_reader = None
+
+
+def init_ocr_worker():
+    """ProcessPoolExecutor initializer: load this worker's EasyOCR reader"""
+    global _worker_reader
+    _worker_reader = easyocr.Reader(['en'], gpu=False)
+
+
+def ocr_page_in_worker(img) -> str:
+    """OCR one page image with the worker process's reader"""
+    return "\n".join(item[1] for item in _worker_reader.readtext(img))
+
+
+# Markdown code fence (optionally tagged json) opening or closing an LLM reply
+RE_CODE_FENCE = re.compile(r'^```(?:json)?|```$')
+
+# "**Field**: value" / "Field: value" lines in non-JSON LLM output. The bold branch is tried
+# first (with full backtracking) before the plain one, as two separate matches used to be.
+RE_LLM_FIELD = re.compile(r'^(?:\*\*(.+?)\*\*|(.+?)):\s*(.+)')
+
+# Extracted-data keys that may hold a person's full name / a document's date, in priority order
+PERSON_NAME_KEYS = ('beneficiary', 'full_name', 'holder_name')
+DOCUMENT_DATE_KEYS = ('notice_date', 'issue_date', 'received_date')
+# ...the date a document is placed at on a person's timeline
+TIMELINE_DATE_KEYS = DOCUMENT_DATE_KEYS + ('arrival_date', 'arrivalissued_date', 'expiration_date')
+# ...a person's date of birth / citizenship
+DATE_OF_BIRTH_KEYS = ('date_of_birth', 'birth_date', 'date_of_birth_mmddyyyy')
+CITIZENSHIP_KEYS = ('country_of_citizenship', 'country_of_birth', 'nationality')
+
+# Where each document type keeps the holder's name: (given-name keys, family-name keys, whether
+# one part alone is enough). Types storing a full name list it as the given part only.
+PERSON_NAME_FIELDS = {
+    'I94': (('first_name', 'first_given_name', 'given_name'), ('last_name', 'lastsurname', 'surname'), True),
+    'I797': (('beneficiary',), (), True),
+    'I797C': (('beneficiary',), (), True),
+    'I129': (('given_name', 'given_name_first_name'), ('family_name', 'family_name_last_name'), False),
+    'EAD': (('full_name',), (), True),
+    'GREEN_CARD': (('full_name',), (), True),
+    'US_PASSPORT': (('holder_name',), (), True),
+    'FOREIGN_PASSPORT': (('holder_name',), (), True),
+    'VISA_STAMP': (('given_name',), ('surname',), False),
+}
+
+
+def first_present(data: Dict, keys: Tuple[str, ...]) -> Any:
+    """Value of the first key in ``keys`` that is set (truthy) in ``data``, else None"""
+    return next((data[key] for key in keys if data.get(key)), None)
+
+
+# Free-text identity fields compared across documents: every name part plus citizenship
+IDENTITY_TEXT_KEYS = frozenset(
+    PERSON_NAME_KEYS + CITIZENSHIP_KEYS +
+    tuple(key for given, family, _ in PERSON_NAME_FIELDS.values() for key in given + family)
+)
+
+
+def normalize_person_fields(data: Dict) -> Dict:
+    """Identity fields of extracted data in one canonical form, for matching and consistency
+    checks: names and countries uppercased and single-spaced, dates of birth in ISO format where
+    they parse. Returns a separate dict; the extracted data users see keeps its original values."""
+    normalized = {}
+    for key in IDENTITY_TEXT_KEYS:
+        value = data.get(key)
+        if isinstance(value, str):
+            normalized[key] = " ".join(value.upper().split())
+    for key in DATE_OF_BIRTH_KEYS[:2]:
+        value = data.get(key)
+        if isinstance(value, str):
+            parsed = parse_date_flexible(value)
+            normalized[key] = parsed.isoformat() if parsed else value
+    return normalized
+
+
+def person_match_key(name: str, dob: Any = None) -> Tuple[str, Any]:
+    """Key under which the same person's documents are grouped, insensitive to OCR/LLM variation
+    in letter case, accents and spacing of the name and in the date-of-birth format. A tuple, so
+    no string is built per lookup and a name can't run into the date."""
+    decomposed = unicodedata.normalize('NFKD', str(name))
+    folded = " ".join(''.join(c for c in decomposed if not unicodedata.combining(c)).upper().split())
+    if not dob:
+        return folded, None
+    return folded, parse_date_flexible(str(dob)) or dob
+
+
+# A PDF given either by its path on disk or by its raw bytes
+PdfSource = Union[str, bytes]
+
+# Characters of segment text sent to the LLM for extraction
+LLM_TEXT_LIMIT = 4000
+
+# Local cache file used when REDIS_URL isn't set and LOCAL_CACHE_ENABLED is true
+LOCAL_CACHE_PATH = os.path.join('.llm_cache', 'cache.sqlite3')
+
+# Recent cache entries also kept in process memory, so repeated segments skip the Redis/SQLite round trip
+EXTRACTION_CACHE_SIZE = 512
+
+# Segments sent to the LLM together in one batched extraction request
+LLM_BATCH_SEGMENTS = 8
+
+# LLM requests (batches or single segments) in flight at once; throttled_llm still enforces the rate limit
+LLM_CONCURRENCY = 4
+
+# Document types with a dedicated extraction prompt (others use the generic prompt)
+LLM_EXTRACTION_TYPES = frozenset({
+    'I797', 'I797C', 'I129', 'PERM', 'PWD', 'LCA', 'I94', 'EAD',
+    'GREEN_CARD', 'US_PASSPORT', 'FOREIGN_PASSPORT', 'VISA_STAMP'
+})
+
+# Families of document types sharing one extractor, whose prompt is chosen from the page text
+USCIS_FORMS = frozenset({'I797', 'I797C'})
+DOL_FORMS = frozenset({'PERM', 'PWD'})
+PASSPORT_TYPES = frozenset({'US_PASSPORT', 'FOREIGN_PASSPORT'})
+CONTENT_ROUTED_TYPES = USCIS_FORMS | DOL_FORMS | PASSPORT_TYPES
+
+# Extraction method for each document type (anything else uses extract_generic_data)
+DOCUMENT_EXTRACTORS = {
+    'I797': 'extract_uscis_form_data',
+    'I797C': 'extract_uscis_form_data',
+    'I129': 'extract_i129_data',
+    'PERM': 'extract_dol_form_data',
+    'PWD': 'extract_dol_form_data',
+    'LCA': 'extract_lca_data',
+    'I94': 'extract_i94_data',
+    'EAD': 'extract_ead_data',
+    'GREEN_CARD': 'extract_green_card_data',
+    'US_PASSPORT': 'extract_passport_data',
+    'FOREIGN_PASSPORT': 'extract_passport_data',
+    'VISA_STAMP': 'extract_visa_data',
+}
+
+BATCH_EXTRACTION_PROMPT = """
+You are processing several immigration document segments at once. Each segment is
+marked [Segment N] in the user message and segments are separated by --- PAGE BREAK ---.
+Apply the extraction instructions given for each segment below and return a single JSON
+object of the form:
+{"segments": [{"segment": 1, "fields": {...}}, {"segment": 2, "fields": {...}}]}
+Return exactly one entry per segment, in order.
+"""
+
 
 class DocumentSegment:
     def __init__(self, pages: List[int], doc_type: str, confidence: float, text: str):
         self.pages = pages
-        self.doc_type = doc_type
+        # Interned: the type is used as a key in every dispatch table and set lookup downstream.
+        # A file that opens with a continuation page has no type yet (None).
+        self.doc_type = sys.intern(doc_type) if isinstance(doc_type, str) else doc_type
         self.confidence = confidence
         self.text = text
         self.extracted_data = {}
 
+    @functools.cached_property
+    def text_lower(self) -> str:
+        """Lowercased text, computed once and shared by every check on this segment"""
+        return self.text.lower()
+
 
 class DocumentProcessor:
     def __init__(self):
         self.setup_clients()
         self.easyocr_reader = easyocr.Reader(['en'], gpu=False)
+        # Warm the detector/recognizer so the first real page isn't slow
+        self.easyocr_reader.readtext(np.zeros((32, 32, 3), dtype=np.uint8))
+        self.ocr_workers = int(os.getenv('OCR_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+        self.batch_pages = int(os.getenv('BATCH_PAGES', 500))
+        self.llm_batch_segments = int(os.getenv('LLM_BATCH_SEGMENTS', LLM_BATCH_SEGMENTS))
+        self.llm_concurrency = int(os.getenv('LLM_CONCURRENCY', LLM_CONCURRENCY))
+        self.ocr_processes = os.getenv('OCR_PROCESSES', 'False').lower() == 'true'
+        self.ocr_process_pool = None
+        self.race_ocr_fallback = os.getenv('RACE_OCR_FALLBACK', 'False').lower() == 'true'
 
     def setup_clients(self):
         """Initialize Azure clients"""
@@ -47,6 +281,7 @@ class DocumentProcessor:
             api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
             azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
         )
+        self.llm_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT")
 
         # Azure Form Recognizer
         self.fr_client = DocumentAnalysisClient(
@@ -54,50 +289,128 @@ class DocumentProcessor:
             credential=AzureKeyCredential(os.getenv("FORM_RECOGNIZER_KEY"))
         )
 
+        # Cache for LLM and OCR results: Redis when configured, otherwise (only if LOCAL_CACHE_ENABLED,
+        # since entries hold extracted personal data in plaintext) a local SQLite file; fronted by an
+        # in-memory LRU
+        redis_url = os.getenv("REDIS_URL")
+        local_cache_enabled = os.getenv('LOCAL_CACHE_ENABLED', 'False').lower() == 'true'
+        local_cache_path = os.getenv("LOCAL_CACHE_PATH", LOCAL_CACHE_PATH)
+        if redis_url:
+            import redis
+            self.cache = redis.Redis.from_url(redis_url)
+        elif local_cache_enabled and local_cache_path:
+            self.cache = SQLiteCache(local_cache_path)
+        else:
+            self.cache = None
+        self.cache_ttl = int(os.getenv("CACHE_TTL_SECONDS", 86400))
+        self.memory_cache = ExtractionCache(int(os.getenv("EXTRACTION_CACHE_SIZE", EXTRACTION_CACHE_SIZE)))
+
+    def cache_get(self, key: str) -> Optional[Any]:
+        """Return a cached JSON value, or None on a miss or when caching is disabled"""
+        memory_cache = self.memory_cache
+        cached = memory_cache.get(key) if memory_cache is not None else None
+        try:
+            if cached is None and self.cache is not None:
+                cached = self.cache.get(key)
+                if cached is not None and memory_cache is not None:
+                    memory_cache.set(key, cached)
+            return orjson.loads(cached) if cached is not None else None
+        except Exception as e:
+            logger.warning("Cache read failed for %s: %s", key, e)
+            return None
+
+    def cache_set(self, key: str, value: Any):
+        """Store a JSON value in the cache (no-op when caching is disabled)"""
+        memory_cache = self.memory_cache
+        if memory_cache is None and self.cache is None:
+            return
+        try:
+            serialized = orjson.dumps(value)
+            if memory_cache is not None:
+                memory_cache.set(key, serialized)
+            if self.cache is not None:
+                self.cache.setex(key, self.cache_ttl, serialized)
+        except Exception as e:
+            logger.warning("Cache write failed for %s: %s", key, e)
+
     @sleep_and_retry
     @limits(calls=20, period=60)
-    def throttled_llm(self, messages):
+    def throttled_llm(self, messages, **kwargs):
         """Rate-limited LLM calls"""
         return self.llm.chat.completions.create(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+            model=self.llm_deployment,
             messages=messages,
-            temperature=0.1
+            temperature=0.1,
+            **kwargs
         )
 
-    def extract_text_multi_method(self, file_path: str) -> Dict[str, Any]:
-        """Extract text using Azure Form Recognizer with EasyOCR fallback."""
-        import time
-        print("=== EXTRACT_TEXT_MULTI_METHOD DEBUG ===")
-        print(f"Timestamp: {time.time()}")
-        print(f"File path: {file_path}")
-        print(f"File exists: {os.path.exists(file_path)}")
-        if os.path.exists(file_path):
-            print(f"File size: {os.path.getsize(file_path)}")
-        print(f"Current working directory: {os.getcwd()}")
-        print("=" * 50)
+    def open_pdf(self, file_path: PdfSource):
+        """Open a PDF given its path or its raw bytes"""
+        if isinstance(file_path, (bytes, bytearray)):
+            return fitz.open(stream=file_path, filetype="pdf")
+        return fitz.open(file_path)
+
+    def read_pdf_bytes(self, file_path: PdfSource) -> bytes:
+        if isinstance(file_path, (bytes, bytearray)):
+            return bytes(file_path)
+        with open(file_path, "rb") as fd:
+            return fd.read()
 
-        file_path = os.path.abspath(file_path)
+    def pdf_source_name(self, file_path: PdfSource) -> Optional[str]:
+        return os.path.basename(file_path) if isinstance(file_path, str) else None
+
+    def extract_text_multi_method(self, file_path: PdfSource) -> Dict[str, Any]:
+        """Extract text with PyMuPDF for born-digital PDFs, otherwise Azure Form Recognizer with EasyOCR fallback."""
+        # Read the file once; PyMuPDF, Azure and the OCR fallback all work from these bytes
+        data = self.read_pdf_bytes(file_path)
+        logger.debug("Extracting text from %s (%s bytes)", self.pdf_source_name(file_path) or "in-memory PDF", len(data))
 
         all_results: Dict[str, str] = {}
         method_used = "azure"
         confidence = 0.0
 
+        # Born-digital PDFs already carry clean text; only scans need OCR
+        try:
+            with self.open_pdf(data) as pdf:
+                text = self.pdf_text(pdf)
+                born_digital = self.is_born_digital(pdf, text)
+            all_results["pymupdf"] = text
+            if born_digital:
+                logger.debug("Born-digital PDF, PyMuPDF extracted %s characters", len(text))
+                return {
+                    "text": text,
+                    "method_used": "pymupdf",
+                    "confidence": 0.95,
+                    "all_results": all_results,
+                }
+        except Exception as e:
+            logger.debug("PyMuPDF extraction failed: %s", e)
+
+        # Optionally start the EasyOCR fallback alongside Azure instead of after it
+        easyocr_future = None
+        if self.race_ocr_fallback:
+            executor = ThreadPoolExecutor(max_workers=1)
+            easyocr_future = executor.submit(self.extract_text_easyocr, data)
+            executor.shutdown(wait=False)
+
         # Attempt Azure extraction
         try:
-            text = self.extract_text_azure(file_path)
+            text = self.extract_text_azure(data)
             all_results["azure"] = text
-            print(f"DEBUG: Azure extracted {len(text)} characters")
+            logger.debug("Azure extracted %s characters", len(text))
         except Exception as e:
-            print(f"DEBUG: Azure extraction failed: {e}")
+            logger.debug("Azure extraction failed: %s", e)
             text = ""
 
         # Fallback to EasyOCR if Azure result is empty
         if not text.strip():
             method_used = "easyocr"
-            text = self.extract_text_easyocr(file_path)
+            text = easyocr_future.result() if easyocr_future else self.extract_text_easyocr(data)
             all_results["easyocr"] = text
             confidence = 0.6 if len(text) > 100 else 0.2
         else:
+            if easyocr_future:
+                easyocr_future.cancel()  # only stops it if it hasn't started; otherwise its result is discarded
             confidence = 0.8 if len(text) > 100 else 0.3
 
         return {
@@ -107,79 +420,246 @@ class DocumentProcessor:
             "all_results": all_results,
         }
 
-    def extract_text_easyocr(self, file_path: str) -> str:
+    def extract_text_easyocr(self, file_path: PdfSource) -> str:
         """Extract text from each page using EasyOCR."""
-        text = ""
-        images = convert_from_path(file_path)
-        for image in images:
-            result = self.easyocr_reader.readtext(np.array(image))
-            page_text = "\n".join([item[1] for item in result])
-            text += page_text + "\n"
-        return text.strip()
-
-    def extract_text_azure(self, file_path: str) -> str:
-        """Extract text using Azure Form Recognizer"""
-        with open(file_path, "rb") as fd:
-            poller = self.fr_client.begin_analyze_document("prebuilt-layout", fd)
-            result = poller.result()
+        # Rendered in-process by PyMuPDF rather than by a poppler subprocess via pdf2image
+        with self.open_pdf(file_path) as pdf:
+            images = [self.render_page_image(page, dpi=EASYOCR_RENDER_DPI) for page in pdf]
+        page_texts = self.ocr_images(images)
+        return "\n".join(page_texts).strip()
+
+    def ocr_images(self, images: List[Any]) -> List[str]:
+        """OCR page images in batches or concurrently, returning one text string per image (in order)."""
+        if not images:
+            return []
+
+        def ocr_one_page(img) -> str:
+            result = self.easyocr_reader.readtext(img)
+            return "\n".join([item[1] for item in result])
+
+        # Batched inference amortizes EasyOCR's per-call overhead; it needs one page shape,
+        # so mixed page sizes are letterboxed onto a shared canvas first
+        shapes = {img.shape for img in images}
+        if len(images) >= OCR_BATCH_MIN_PAGES:
+            if len(shapes) > 1:
+                images = self.letterbox_images(images)
+            height, width = images[0].shape[:2]
+            results = self.easyocr_reader.readtext_batched(
+                images, n_width=width, n_height=height, batch_size=OCR_BATCH_SIZE
+            )
+            return ["\n".join(item[1] for item in result) for result in results]
+
+        workers = min(self.ocr_workers, len(images))
+        if workers <= 1:
+            return [ocr_one_page(img) for img in images]
+
+        if self.ocr_processes:
+            # One reader per worker process; the pool is kept so models load only once
+            if self.ocr_process_pool is None:
+                self.ocr_process_pool = ProcessPoolExecutor(
+                    max_workers=self.ocr_workers, initializer=init_ocr_worker
+                )
+            return list(self.ocr_process_pool.map(ocr_page_in_worker, images))
+
+        # EasyOCR (PyTorch) releases the GIL during inference, so threads sharing
+        # the already-loaded reader run pages in parallel
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(ocr_one_page, images))
+
+    def letterbox_images(self, images: List[Any]) -> Any:
+        """Pad RGB page images onto one white (N, H, W, 3) array sized to the largest page.
+
+        Pages are placed top-left at their rendered scale rather than resized, so text
+        keeps the glyph size the OCR models expect; the padding is blank paper.
+        """
+        height = max(img.shape[0] for img in images)
+        width = max(img.shape[1] for img in images)
+        pages = np.full((len(images), height, width, 3), 255, dtype=np.uint8)
+        for page, img in zip(pages, images):
+            page[:img.shape[0], :img.shape[1]] = img
+        return pages
+
+    def extract_text_azure(self, file_path: PdfSource) -> str:
+        """Extract text using Azure Form Recognizer (cached by the PDF's SHA-256)"""
+        data = self.read_pdf_bytes(file_path)
+
+        cache_key = "azure:" + hashlib.sha256(data).hexdigest()
+        cached = self.cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        poller = self.fr_client.begin_analyze_document("prebuilt-layout", data)
+        text = "\n".join(self.iter_azure_page_text(poller.result())).strip()
+
+        self.cache_set(cache_key, text)
+        return text
 
-        text = ""
+    def iter_azure_page_text(self, result):
+        """Yield one text string per Form Recognizer page without building intermediate copies"""
         for page in result.pages:
-            for line in page.lines:
-                text += line.content + "\n"
-        return text.strip()
+            yield "\n".join(line.content for line in page.lines)
 
-    def extract_text_pymupdf(self, file_path: str) -> str:
+    def extract_text_pymupdf(self, file_path: PdfSource) -> str:
         """Extract text using PyMuPDF as fallback"""
-        text = ""
-        with fitz.open(file_path) as pdf:
-            for page in pdf:
-                text += page.get_text() + "\n"
-        return text.strip()
+        with self.open_pdf(file_path) as pdf:
+            return self.pdf_text(pdf)
+
+    def pdf_text(self, pdf) -> str:
+        """Embedded text of an open PyMuPDF document"""
+        return "\n".join(self.page_text(page) for page in pdf).strip()
+
+    def page_text(self, page) -> str:
+        """Embedded text of a single page.
+
+        Uses "blocks" mode without TEXT_PRESERVE_IMAGES so image blocks (seals,
+        signatures, watermarks) are skipped instead of being decoded.
+        """
+        flags = fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP
+        blocks = page.get_text("blocks", flags=flags)
+        text = "".join(block[4] for block in blocks if block[6] == 0)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            stream_size = len(page.read_contents())
+            if stream_size > 1000 * max(len(text), 1):
+                logger.debug(
+                    "Page %s looks image-dominant: %s content-stream bytes for %s text chars",
+                    page.number + 1, stream_size, len(text)
+                )
+        return text
+
+    def is_born_digital(self, pdf, text: str) -> bool:
+        """Check whether the embedded text is trustworthy enough to skip OCR"""
+        if not pdf.page_count or len(text) / pdf.page_count < BORN_DIGITAL_MIN_CHARS_PER_PAGE:
+            return False
+
+        # Mojibake: unmappable glyphs come out as U+FFFD replacement characters
+        if text.count('\ufffd') > len(text) * 0.01:
+            return False
+
+        # Text must come from fonts that map glyphs to Unicode (ToUnicode CMap or a named encoding)
+        for page in pdf:
+            for font in page.get_fonts():
+                xref, encoding = font[0], font[5]
+                if encoding or pdf.xref_get_key(xref, "ToUnicode")[0] != "null":
+                    return True
+        return False
 
-    def get_page_text(self, page, page_num: int, min_length: int = 20) -> str:
+    def render_page_image(self, page, dpi: int = OCR_RENDER_DPI):
+        """Render a PyMuPDF page to a contiguous RGB numpy array for OCR.
+
+        Rendering straight to RGB without alpha avoids slicing off an alpha channel
+        (a non-contiguous view EasyOCR would copy), and a fixed DPI gives same-sized
+        pages the same shape so they can be OCR'd in batches.
+        """
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+        return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, 3)
+
+    def get_page_text(self, page, page_num: int, min_length: int = MIN_PAGE_TEXT_LENGTH) -> str:
         """Get text from a page using PyMuPDF with EasyOCR fallback."""
-        text = page.get_text()
+        text = self.page_text(page)
         if len(text.strip()) < min_length:
-            pix = page.get_pixmap()
-            img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-            if pix.n > 3:
-                img = img[:, :, :3]
-            ocr_result = self.easyocr_reader.readtext(img)
+            ocr_result = self.easyocr_reader.readtext(self.render_page_image(page))
             text = "\n".join([item[1] for item in ocr_result])
-            print(f"DEBUG: Page {page_num + 1} text extracted using EasyOCR")
+            logger.debug("Page %s text extracted using EasyOCR", page_num + 1)
         else:
-            print(f"DEBUG: Page {page_num + 1} text extracted using PyMuPDF")
+            logger.debug("Page %s text extracted using PyMuPDF", page_num + 1)
         return text
 
-    def analyze_pdf_by_pages(self, file_path: str) -> Tuple[List[DocumentSegment], List[Dict]]:
+    def extract_page_range_text(self, pdf, start: int, stop: int) -> Tuple[List[str], set]:
+        """Get text for pages [start, stop); pages without enough embedded text are OCR'd together.
+
+        Returns the page texts and the set of page numbers that needed OCR.
+        """
+        page_texts = [self.page_text(pdf[page_num]) for page_num in range(start, stop)]
+        ocr_page_nums = [
+            page_num for page_num, text in enumerate(page_texts, start)
+            if len(text.strip()) < MIN_PAGE_TEXT_LENGTH
+        ]
+        if ocr_page_nums:
+            for page_num, text in zip(ocr_page_nums, self.render_and_ocr_pages(pdf, ocr_page_nums)):
+                page_texts[page_num - start] = text
+            logger.debug("Pages extracted using EasyOCR: %s", [n + 1 for n in ocr_page_nums])
+
+        return page_texts, set(ocr_page_nums)
+
+    def render_and_ocr_pages(self, pdf, page_nums: List[int]) -> List[str]:
+        """Render and OCR pages, one text per page (in order).
+
+        Pages go through OCR in chunks of OCR_BATCH_SIZE while a background thread renders
+        the next chunks, so PyMuPDF rendering overlaps OCR instead of preceding it. Only the
+        renderer thread touches the document until it finishes.
+        """
+        if len(page_nums) <= OCR_BATCH_SIZE:
+            return self.ocr_images([self.render_page_image(pdf[page_num]) for page_num in page_nums])
+
+        chunks = [page_nums[i:i + OCR_BATCH_SIZE] for i in range(0, len(page_nums), OCR_BATCH_SIZE)]
+        rendered: queue.Queue = queue.Queue(maxsize=RENDER_QUEUE_CHUNKS)
+        stopped = threading.Event()
+
+        def put(item) -> bool:
+            while not stopped.is_set():
+                try:
+                    rendered.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def render():
+            try:
+                for chunk in chunks:
+                    if not put([self.render_page_image(pdf[page_num]) for page_num in chunk]):
+                        return
+            except Exception as e:
+                put(e)
+
+        renderer = threading.Thread(target=render, name="page-renderer", daemon=True)
+        renderer.start()
+        texts: List[str] = []
+        try:
+            for _ in chunks:
+                images = rendered.get()
+                if isinstance(images, Exception):
+                    raise images
+                texts.extend(self.ocr_images(images))
+        finally:
+            stopped.set()
+            renderer.join()
+        return texts
+
+    def analyze_pdf_by_pages(self, file_path: PdfSource) -> Tuple[List[DocumentSegment], List[Dict]]:
         """Break PDF into logical document segments (returns segments + per-page diagnostics)."""
         segments: List[DocumentSegment] = []
 
-        with fitz.open(file_path) as pdf:
+        with self.open_pdf(file_path) as pdf:
             page_analyses: List[Dict] = []
 
-            # First pass: analyze each page
-            for page_num in range(len(pdf)):
-                page = pdf[page_num]
-                page_text = self.get_page_text(page, page_num)
+            # First pass: analyze each page, in batches so only one batch of
+            # rendered page images is held in memory at a time
+            for start in range(0, pdf.page_count, self.batch_pages):
+                stop = min(start + self.batch_pages, pdf.page_count)
+                page_texts, ocr_page_nums = self.extract_page_range_text(pdf, start, stop)
 
-                detected_types, diagnostics = self.detect_document_types_on_page(page_text)
-
-                if not detected_types:
-                    logger.debug(
-                        "No document types detected on page %s: %s",
-                        page_num,
-                        diagnostics,
+                for page_num, page_text in enumerate(page_texts, start):
+                    text_lower = page_text.lower()
+                    detected_types, diagnostics = self.detect_document_types_on_page(
+                        page_text, text_lower, ocr_used=page_num in ocr_page_nums
                     )
 
-                page_analyses.append({
-                    'page_num': page_num,
-                    'text': page_text,
-                    'detected_types': detected_types,
-                    'diagnostics': diagnostics,
-                    'is_continuation': self.is_continuation_page(page_text)
-                })
+                    if not detected_types:
+                        logger.debug(
+                            "No document types detected on page %s: %s",
+                            page_num,
+                            diagnostics,
+                        )
+
+                    page_analyses.append({
+                        'page_num': page_num,
+                        'text': page_text,
+                        'detected_types': detected_types,
+                        'diagnostics': diagnostics,
+                        'is_continuation': self.is_continuation_page(page_text, text_lower)
+                    })
 
             # Second pass: group pages into document segments
             segments = self.group_pages_into_documents(page_analyses)
@@ -196,186 +676,199 @@ class DocumentProcessor:
         return segments, page_diagnostics
 
     def detect_document_types_on_page(
-        self, page_text: str, ocr_used: bool = False
+        self, page_text: str, text_lower: Optional[str] = None, ocr_used: bool = False
     ) -> Tuple[List[Tuple[str, float]], Dict[str, Any]]:
         """Detect multiple document types on a single page - ENHANCED VERSION"""
-        text_lower = page_text.lower()
-        text_upper = page_text.upper()
+        if text_lower is None:
+            text_lower = page_text.lower()
+        found = self.find_keywords(text_lower)
+        has_receipt_number = bool(RE_RECEIPT_NUMBER.search(page_text))
         detections: List[Tuple[str, float]] = []
         indicators: Dict[str, Any] = {}
 
-        print("DEBUG: Analyzing page text for document type detection...")
-        print(f"DEBUG: First 200 chars: {page_text[:200]}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Analyzing page text for document type detection...")
+            logger.debug("First 200 chars: %s", page_text[:200])
+
+        def finish():
+            logger.debug("Final detections: %s", detections)
+            diagnostics = {
+                'page_length': len(page_text),
+                'ocr_used': ocr_used,
+                'indicators_checked': indicators,
+            }
+            return sorted(detections, key=lambda x: x[1], reverse=True), diagnostics
 
         # I-797 Notice of Action - Enhanced detection (includes I-140 approvals)
         i797_indicators = [
-            'notice of action' in text_lower,
-            'i-797' in text_lower,
-            '1-797' in text_lower,
-            'I-797' in page_text,
-            '1-797' in page_text,
-            'uscis' in text_lower,
-            'department of homeland security' in text_lower,
-            'u.s. citizenship and immigration services' in text_lower,
-            bool(re.search(r'receipt number.*[A-Z]{3}\d{10}', page_text, re.IGNORECASE)),
-            ('approval notice' in text_lower and any(case in text_lower for case in ['i-140', 'i-129']))
+            'notice of action' in found,
+            'i-797' in found,
+            '1-797' in found,
+            'uscis' in found,
+            'department of homeland security' in found,
+            'u.s. citizenship and immigration services' in found,
+            has_receipt_number,
+            ('approval notice' in found and any(case in found for case in ['i-140', 'i-129']))
         ]
         indicators['I797'] = i797_indicators
         if any(i797_indicators):
             confidence = 0.9
-            if re.search(r'receipt number.*[A-Z]{3}\d{10}', page_text, re.IGNORECASE):
+            if has_receipt_number:
                 confidence = 0.95
             detections.append(('I797', confidence))
-            print(f"DEBUG: Detected I-797 with confidence {confidence}")
+            logger.debug("Detected I-797 with confidence %s", confidence)
+            if confidence >= EARLY_EXIT_CONFIDENCE:
+                return finish()
 
         # I-797C (Receipt Notice) - includes I-140 receipt notices
         i797c_indicators = [
-            ('i-797c' in text_lower or '1-797c' in text_lower),
-            ('notice of action' in text_lower and 'receipt' in text_lower),
-            ('receipt notice' in text_lower),
+            ('i-797c' in found or '1-797c' in found),
+            ('notice of action' in found and 'receipt' in found),
+            ('receipt notice' in found),
             (
-                'receipt number' in text_lower
-                and any(case in text_lower for case in ['i-140', 'i-129'])
-                and 'approval' not in text_lower
+                'receipt number' in found
+                and any(case in found for case in ['i-140', 'i-129'])
+                and 'approval' not in found
             ),
         ]
         indicators['I797C'] = i797c_indicators
         if any(i797c_indicators):
             confidence = 0.85
-            if re.search(r'receipt number.*[A-Z]{3}\d{10}', page_text, re.IGNORECASE):
+            if has_receipt_number:
                 confidence = 0.9
             detections.append(('I797C', confidence))
-            print(f"DEBUG: Detected I-797C with confidence {confidence}")
+            logger.debug("Detected I-797C with confidence %s", confidence)
 
         # I-129 Petition (standalone petitions, not notices)
         i129_indicators = [
-            'i-129' in text_lower,
-            'petition for a nonimmigrant worker' in text_lower,
-            'notice of action' not in text_lower,
+            'i-129' in found,
+            'petition for a nonimmigrant worker' in found,
+            'notice of action' not in found,
         ]
         indicators['I129'] = i129_indicators
         if all(i129_indicators):
             detections.append(('I129', 0.85))
-            print("DEBUG: Detected I-129")
+            logger.debug("Detected I-129")
 
         # Labor Certification (PERM) - 9089
         perm_indicators = [
-            phrase in text_lower for phrase in ['labor certification', 'form 9089', 'perm']
+            phrase in found for phrase in ['labor certification', 'form 9089', 'perm']
         ]
         indicators['PERM'] = perm_indicators
         if any(perm_indicators):
             detections.append(('PERM', 0.9))
-            print("DEBUG: Detected PERM")
+            logger.debug("Detected PERM")
 
         # Prevailing Wage Determination - 9141
         pwd_indicators = [
-            phrase in text_lower for phrase in ['prevailing wage', 'form 9141', 'pwd']
+            phrase in found for phrase in ['prevailing wage', 'form 9141', 'pwd']
         ]
         indicators['PWD'] = pwd_indicators
         if any(pwd_indicators):
             detections.append(('PWD', 0.85))
-            print("DEBUG: Detected PWD")
+            logger.debug("Detected PWD")
 
         # LCA Form 9035
         lca_phrases = [
-            phrase in text_lower
+            phrase in found
             for phrase in ['eta-9035', 'eta 9035', 'labor condition application', 'lca', 'form 9035']
         ]
-        lca_dol = 'department of labor' in text_lower
+        lca_dol = 'department of labor' in found
         indicators['LCA'] = lca_phrases + [lca_dol]
         if any(lca_phrases):
             confidence = 0.9
             if lca_dol:
                 confidence = 0.95
             detections.append(('LCA', confidence))
-            print(f"DEBUG: Detected LCA with confidence {confidence}")
+            logger.debug("Detected LCA with confidence %s", confidence)
+            if confidence >= EARLY_EXIT_CONFIDENCE:
+                return finish()
 
         # I-94
         i94_indicators = [
-            bool(re.search(r'i[-\s]?94', text_lower)),
-            any(phrase in text_lower for phrase in ['arrival departure', 'admission number']),
+            bool(RE_I94.search(text_lower)),
+            any(phrase in found for phrase in ['arrival departure', 'admission number']),
         ]
         indicators['I94'] = i94_indicators
         if any(i94_indicators):
             detections.append(('I94', 0.8))
-            print("DEBUG: Detected I-94")
+            logger.debug("Detected I-94")
 
         # EAD (Employment Authorization Document)
         ead_phrase = any(
-            phrase in text_lower for phrase in ['employment authorization', 'ead', 'work permit', 'i-766']
+            phrase in found for phrase in ['employment authorization', 'ead', 'work permit', 'i-766']
         )
-        ead_number = bool(re.search(r'uscis number.*[A-Z0-9]{9,}', page_text, re.IGNORECASE))
+        ead_number = bool(RE_USCIS_NUMBER.search(page_text))
         indicators['EAD'] = [ead_phrase, ead_number]
         if ead_phrase:
             confidence = 0.85
             if ead_number:
                 confidence = 0.9
             detections.append(('EAD', confidence))
-            print(f"DEBUG: Detected EAD with confidence {confidence}")
+            logger.debug("Detected EAD with confidence %s", confidence)
 
         # Green Card (Permanent Resident Card)
         gc_phrase = any(
-            phrase in text_lower for phrase in ['permanent resident card', 'green card', 'i-551']
+            phrase in found for phrase in ['permanent resident card', 'green card', 'i-551']
         )
-        gc_number = bool(re.search(r'uscis.*[A-Z0-9]{9,}', page_text, re.IGNORECASE))
+        gc_number = bool(RE_USCIS_ID.search(page_text))
         indicators['GREEN_CARD'] = [gc_phrase, gc_number]
         if gc_phrase:
             confidence = 0.9
             if gc_number:
                 confidence = 0.95
             detections.append(('GREEN_CARD', confidence))
-            print(f"DEBUG: Detected Green Card with confidence {confidence}")
+            logger.debug("Detected Green Card with confidence %s", confidence)
+            if confidence >= EARLY_EXIT_CONFIDENCE:
+                return finish()
 
         # Passport
-        us_passport = bool(re.search(r'passport.*united states|type.*p\b', page_text, re.IGNORECASE))
-        foreign_passport = 'passport' in text_lower
+        us_passport = bool(RE_US_PASSPORT.search(page_text))
+        foreign_passport = 'passport' in found
         indicators['US_PASSPORT'] = [us_passport]
         indicators['FOREIGN_PASSPORT'] = [foreign_passport]
         if us_passport:
             detections.append(('US_PASSPORT', 0.8))
-            print("DEBUG: Detected US Passport")
+            logger.debug("Detected US Passport")
         elif foreign_passport:
             detections.append(('FOREIGN_PASSPORT', 0.7))
-            print("DEBUG: Detected Foreign Passport")
+            logger.debug("Detected Foreign Passport")
 
         # Visa stamp
         visa_indicators = [
-            any(phrase in text_lower for phrase in ['visa', 'embassy', 'consulate']),
-            any(phrase in text_lower for phrase in ['immigrant', 'nonimmigrant']),
+            any(phrase in found for phrase in ['visa', 'embassy', 'consulate']),
+            any(phrase in found for phrase in ['immigrant', 'nonimmigrant']),
         ]
         indicators['VISA_STAMP'] = visa_indicators
         if all(visa_indicators):
             detections.append(('VISA_STAMP', 0.8))
-            print("DEBUG: Detected Visa Stamp")
+            logger.debug("Detected Visa Stamp")
 
-        print(f"DEBUG: Final detections: {detections}")
-        diagnostics = {
-            'page_length': len(page_text),
-            'ocr_used': ocr_used,
-            'indicators_checked': indicators,
-        }
-        return sorted(detections, key=lambda x: x[1], reverse=True), diagnostics
+        return finish()
+
+    def find_keywords(self, text_lower: str) -> set:
+        """Detection keywords occurring in the lowercased page text, found in one pass when available"""
+        if KEYWORD_AUTOMATON is not None:
+            return {keyword for _, keyword in KEYWORD_AUTOMATON.iter(text_lower)}
+        return {keyword for keyword in DETECTION_KEYWORDS if keyword in text_lower}
 
-    def is_continuation_page(self, page_text: str) -> bool:
+    def is_continuation_page(self, page_text: str, text_lower: Optional[str] = None) -> bool:
         """Determine if page is continuation of previous document"""
-        text_lower = page_text.lower()
+        if text_lower is None:
+            text_lower = page_text.lower()
 
-        continuation_indicators = [
-            r'page \d+', r'page \d+ of \d+', 'continued', r'\(continued\)',
-            'attachment', 'exhibit'
-        ]
+        if any(marker in text_lower for marker in CONTINUATION_MARKERS):
+            return True
 
-        for indicator in continuation_indicators:
-            if re.search(indicator, text_lower):
-                return True
+        if RE_PAGE_NUMBER.search(text_lower):
+            return True
 
         # Short pages likely continuations
         if len(page_text.strip()) < 200:
             return True
 
         # Pages without headers likely continuations
-        header_indicators = ['form', 'department', 'certificate', 'notice']
-        if not any(indicator in text_lower for indicator in header_indicators):
+        if not any(indicator in text_lower for indicator in HEADER_INDICATORS):
             return True
 
         return False
@@ -435,21 +928,18 @@ class DocumentProcessor:
     def create_segment(self, page_numbers: List[int], doc_type: str,
                        confidence: float, page_analyses: List[Dict]) -> DocumentSegment:
         """Create DocumentSegment from page numbers"""
-        combined_text = ""
-        for page_num in page_numbers:
-            combined_text += page_analyses[page_num]['text'] + "\n\n"
-
+        combined_text = "\n\n".join(page_analyses[page_num]['text'] for page_num in page_numbers)
         return DocumentSegment(page_numbers, doc_type, confidence, combined_text.strip())
 
-    def process_multi_document_file(self, file_path: str, options: Dict = None) -> Dict:
-        """Process file that may contain multiple document types"""
+    def process_multi_document_file(self, file_path: PdfSource, options: Dict = None) -> Dict:
+        """Process file (path or PDF bytes) that may contain multiple document types"""
         if options is None:
             options = {}
 
         results = {
-            'processing_id': str(uuid.uuid4()),
-            'file_path': os.path.basename(file_path),
-            'processed_at': datetime.utcnow().isoformat(),
+            'processing_id': uuid.uuid4().hex,
+            'file_path': self.pdf_source_name(file_path),
+            'processed_at': datetime.now(timezone.utc).isoformat(),
             'segments_found': 0,
             'documents_processed': [],
             'person_records': {},
@@ -464,13 +954,35 @@ class DocumentProcessor:
             if options.get('include_page_diagnostics'):
                 results['page_diagnostics'] = page_diagnostics
 
-            # Process each segment
-            for segment in segments:
-                segment_result = self.process_document_segment(segment, options)
+            # Extract fields for all segments in as few LLM requests as possible
+            batched_data = self.extract_segments_batched(segments)
+
+            # Process each segment; segments without batched data make their own LLM calls, concurrently.
+            # Fields are validated afterwards for all segments at once.
+            segment_options = {**options, 'validate_fields': False}
+
+            def process_segment(item):
+                segment, extracted_data = item
+                if extracted_data is not None:
+                    return self.process_document_segment(segment, segment_options, extracted_data)
+                return self.process_document_segment(segment, segment_options)
+
+            segment_results = self.map_llm_calls(process_segment, list(zip(segments, batched_data)))
+
+            if options.get('validate_fields', True):
+                batch_validation = validate_segments_batch(
+                    [segment_result['extracted_data'] for segment_result in segment_results],
+                    [segment_result['document_type'] for segment_result in segment_results],
+                )
+                for segment_result, validation_results in zip(segment_results, batch_validation):
+                    segment_result['validation_results'] = validation_results
+
+            person_index: Dict[Tuple[str, Any], str] = {}
+            for segment_result in segment_results:
                 results['documents_processed'].append(segment_result)
 
                 # Cross-reference person data
-                self.consolidate_person_data(segment_result, results['person_records'])
+                self.consolidate_person_data(segment_result, results['person_records'], person_index)
 
             # Generate audit summary
             results['processing_summary'] = self.generate_audit_summary(results)
@@ -491,59 +1003,46 @@ class DocumentProcessor:
 
         return results
 
-    def process_document_segment(self, segment: DocumentSegment, options: Dict) -> Dict:
-        """Process single document segment"""
+    def process_document_segment(self, segment: DocumentSegment, options: Dict,
+                                 extracted_data: Optional[Dict] = None) -> Dict:
+        """Process single document segment (skips the LLM call when extracted_data is supplied)"""
         segment_result = {
             'pages': segment.pages,
             'document_type': segment.doc_type,
             'confidence': segment.confidence,
             'extracted_data': {},
+            'identity_fields': {},
             'validation_results': {},
             'processing_notes': []
         }
 
-        print(f"DEBUG: Processing segment - Type: {segment.doc_type}, Confidence: {segment.confidence}")
+        logger.debug("Processing segment - Type: %s, Confidence: %s", segment.doc_type, segment.confidence)
 
         # Extract data based on document type
         try:
-            if segment.doc_type in ['I797', 'I797C']:
-                print("DEBUG: Extracting USCIS I-797 form data...")
-                segment_result['extracted_data'] = self.extract_uscis_form_data(segment.text)
-            elif segment.doc_type == 'I129':
-                print("DEBUG: Extracting I-129 form data...")
-                segment_result['extracted_data'] = self.extract_i129_data(segment.text)
-            elif segment.doc_type in ['PERM', 'PWD']:
-                print("DEBUG: Extracting DOL form data...")
-                segment_result['extracted_data'] = self.extract_dol_form_data(segment.text)
-            elif segment.doc_type == 'LCA':
-                print("DEBUG: Extracting LCA form data...")
-                segment_result['extracted_data'] = self.extract_lca_data(segment.text)
-            elif segment.doc_type == 'I94':
-                print("DEBUG: Extracting I-94 data...")
-                segment_result['extracted_data'] = self.extract_i94_data(segment.text)
-            elif segment.doc_type == 'EAD':
-                print("DEBUG: Extracting EAD data...")
-                segment_result['extracted_data'] = self.extract_ead_data(segment.text)
-            elif segment.doc_type == 'GREEN_CARD':
-                print("DEBUG: Extracting Green Card data...")
-                segment_result['extracted_data'] = self.extract_green_card_data(segment.text)
-            elif segment.doc_type in ['US_PASSPORT', 'FOREIGN_PASSPORT']:
-                print("DEBUG: Extracting passport data...")
-                segment_result['extracted_data'] = self.extract_passport_data(segment.text)
-            elif segment.doc_type == 'VISA_STAMP':
-                print("DEBUG: Extracting visa data...")
-                segment_result['extracted_data'] = self.extract_visa_data(segment.text)
+            if extracted_data is not None:
+                logger.debug("Using batched LLM extraction result")
+                segment_result['extracted_data'] = extracted_data
+                if segment.doc_type not in LLM_EXTRACTION_TYPES:
+                    segment_result['processing_notes'].append(
+                        "Unknown document type - used generic extraction"
+                    )
             else:
-                print(f"DEBUG: Unknown document type: {segment.doc_type}, using generic extraction")
-                segment_result['extracted_data'] = self.extract_generic_data(segment.text)
-                segment_result['processing_notes'].append(
-                    "Unknown document type - used generic extraction"
+                logger.debug("Extracting %s data...", segment.doc_type)
+                segment_result['extracted_data'] = self.extract_document_data(
+                    segment.doc_type, segment.text, segment.text_lower
                 )
+                if segment.doc_type not in DOCUMENT_EXTRACTORS:
+                    segment_result['processing_notes'].append(
+                        "Unknown document type - used generic extraction"
+                    )
 
-            print(f"DEBUG: Extraction result: {segment_result['extracted_data']}")
+            logger.debug("Extraction result: %s", segment_result['extracted_data'])
+            # Normalised once here; person matching and consistency checks read this copy
+            segment_result['identity_fields'] = normalize_person_fields(segment_result['extracted_data'])
 
         except Exception as e:
-            print(f"DEBUG: Extraction error: {str(e)}")
+            logger.debug("Extraction error: %s", e)
             segment_result['processing_notes'].append(f"Extraction error: {str(e)}")
 
         # Validate data if requested
@@ -554,18 +1053,22 @@ class DocumentProcessor:
 
         return segment_result
 
+    def extract_document_data(self, doc_type: str, text: str, text_lower: Optional[str] = None) -> Dict:
+        """Run the extraction method registered for doc_type in DOCUMENT_EXTRACTORS"""
+        extractor = getattr(self, DOCUMENT_EXTRACTORS.get(doc_type, 'extract_generic_data'))
+        if doc_type in CONTENT_ROUTED_TYPES:
+            return extractor(text, text_lower)
+        return extractor(text)
+
     # Document-specific extraction methods
-    def extract_uscis_form_data(self, text: str) -> Dict:
+    def extract_uscis_form_data(self, text: str, text_lower: Optional[str] = None) -> Dict:
         """Extract USCIS form data (I-797, I-797C) using LLM"""
-        print("DEBUG: Getting USCIS prompt...")
-        # Determine if it's I-797 or I-797C based on content
-        if 'receipt notice' in text.lower() or 'i-797c' in text.lower():
-            prompt = get_document_specific_prompt('I797C')
-        else:
-            prompt = get_document_specific_prompt('I797')
-        print("DEBUG: Calling LLM for USCIS extraction...")
+        logger.debug("Getting USCIS prompt...")
+        # I-797 or I-797C is decided from the content
+        prompt = self.segment_prompt('I797', text, text_lower)
+        logger.debug("Calling LLM for USCIS extraction...")
         result = self.extract_with_llm(text, prompt)
-        print(f"DEBUG: LLM extraction result: {result}")
+        logger.debug("LLM extraction result: %s", result)
         return result
 
     def extract_i129_data(self, text: str) -> Dict:
@@ -573,12 +1076,9 @@ class DocumentProcessor:
         prompt = get_document_specific_prompt('I129')
         return self.extract_with_llm(text, prompt)
 
-    def extract_dol_form_data(self, text: str) -> Dict:
+    def extract_dol_form_data(self, text: str, text_lower: Optional[str] = None) -> Dict:
         """Extract DOL form data (PERM/PWD)"""
-        if 'perm' in text.lower() or '9089' in text:
-            prompt = get_document_specific_prompt('PERM')
-        else:
-            prompt = get_document_specific_prompt('PWD')
+        prompt = self.segment_prompt('PERM', text, text_lower)
         return self.extract_with_llm(text, prompt)
 
     def extract_lca_data(self, text: str) -> Dict:
@@ -601,12 +1101,9 @@ class DocumentProcessor:
         prompt = get_document_specific_prompt('GREEN_CARD')
         return self.extract_with_llm(text, prompt)
 
-    def extract_passport_data(self, text: str) -> Dict:
+    def extract_passport_data(self, text: str, text_lower: Optional[str] = None) -> Dict:
         """Extract passport data"""
-        if 'united states' in text.lower() or 'usa' in text.lower():
-            prompt = get_document_specific_prompt('US_PASSPORT')
-        else:
-            prompt = get_document_specific_prompt('FOREIGN_PASSPORT')
+        prompt = self.segment_prompt('US_PASSPORT', text, text_lower)
         return self.extract_with_llm(text, prompt)
 
     def extract_visa_data(self, text: str) -> Dict:
@@ -619,145 +1116,233 @@ class DocumentProcessor:
         prompt = get_document_specific_prompt('GENERIC')
         return self.extract_with_llm(text, prompt)
 
+    def segment_prompt(self, doc_type: str, text: str, text_lower: Optional[str] = None) -> str:
+        """Pick the extraction prompt the per-type extract_* method would use"""
+        if text_lower is None:
+            text_lower = text.lower()
+        if doc_type in USCIS_FORMS:
+            if 'receipt notice' in text_lower or 'i-797c' in text_lower:
+                return get_document_specific_prompt('I797C')
+            return get_document_specific_prompt('I797')
+        if doc_type in DOL_FORMS:
+            if 'perm' in text_lower or '9089' in text:
+                return get_document_specific_prompt('PERM')
+            return get_document_specific_prompt('PWD')
+        if doc_type in PASSPORT_TYPES:
+            if 'united states' in text_lower or 'usa' in text_lower:
+                return get_document_specific_prompt('US_PASSPORT')
+            return get_document_specific_prompt('FOREIGN_PASSPORT')
+        if doc_type in LLM_EXTRACTION_TYPES:
+            return get_document_specific_prompt(doc_type)
+        return get_document_specific_prompt('GENERIC')
+
+    def llm_cache_key(self, text: str, prompt: str) -> str:
+        """Cache key for an extraction: the model deployment, the prompt and only the text the model
+        is actually sent count"""
+        model = self.llm_deployment or ""
+        return "llm:" + hashlib.sha256((model + "|" + prompt + "|" + text[:LLM_TEXT_LIMIT]).encode()).hexdigest()
+
+    def extract_segments_batched(self, segments: List[DocumentSegment]) -> List[Optional[Dict]]:
+        """
+        Extract fields for several segments per LLM request.
+        Returns one entry per segment; None means the caller should fall back to per-segment extraction.
+        """
+        results: List[Optional[Dict]] = [None] * len(segments)
+        pending = []
+        for i, segment in enumerate(segments):
+            prompt = self.segment_prompt(segment.doc_type, segment.text, segment.text_lower)
+            cached = self.cache_get(self.llm_cache_key(segment.text, prompt))
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append((i, prompt))
+
+        batch_size = self.llm_batch_segments
+        # A lone segment costs the same either way; it keeps the simpler per-segment path
+        batches = [
+            batch for batch in (pending[start:start + batch_size] for start in range(0, len(pending), batch_size))
+            if len(batch) >= 2
+        ]
+
+        def extract_batch(batch):
+            return self.extract_batch_with_llm([(segments[i].text, prompt) for i, prompt in batch])
+
+        for batch, parsed in zip(batches, self.map_llm_calls(extract_batch, batches)):
+            if parsed is None:
+                continue
+            for (i, prompt), data in zip(batch, parsed):
+                results[i] = data
+                if data:
+                    self.cache_set(self.llm_cache_key(segments[i].text, prompt), data)
+
+        return results
+
+    def map_llm_calls(self, func, items: List[Any]) -> List[Any]:
+        """Apply an LLM-calling function to each item, overlapping the requests; results keep item order"""
+        workers = min(self.llm_concurrency, len(items))
+        if workers <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(func, items))
+
+    def extract_batch_with_llm(self, items: List[Tuple[str, str]]) -> Optional[List[Optional[Dict]]]:
+        """
+        Extract fields for (text, prompt) pairs in one JSON-mode LLM call.
+        None if the reply is unusable; a None entry marks a segment the reply left out or garbled.
+        """
+        instructions = "\n".join(
+            f"Instructions for segment {n}:\n{prompt.strip()}" for n, (_, prompt) in enumerate(items, 1)
+        )
+        messages = [
+            {"role": "system", "content": BATCH_EXTRACTION_PROMPT + "\n" + instructions},
+            {"role": "user", "content": "\n--- PAGE BREAK ---\n".join(
+                f"[Segment {n}]\n{text[:LLM_TEXT_LIMIT]}" for n, (text, _) in enumerate(items, 1)
+            )}
+        ]
+
+        try:
+            logger.debug("Making batched LLM call for %s segments...", len(items))
+            response = self.throttled_llm(messages, response_format={"type": "json_object"})
+            content = response.choices[0].message.content or ""
+            entries = orjson.loads(content)["segments"]
+            by_number = {int(entry["segment"]): entry.get("fields") for entry in entries}
+        except Exception as e:
+            logger.debug("Batched LLM extraction failed, falling back to per-segment calls: %s", e)
+            return None
+
+        parsed = [by_number.get(n) for n in range(1, len(items) + 1)]
+        # A segment without an object of fields is retried on its own rather than stored as empty
+        parsed = [fields if isinstance(fields, dict) else None for fields in parsed]
+        missing = parsed.count(None)
+        if missing:
+            logger.debug("Batched LLM reply had no fields for %s of %s segments", missing, len(items))
+        return parsed
+
     def extract_with_llm(self, text: str, prompt: str) -> Dict:
-        """Extract data using LLM with structured output"""
+        """Extract data using LLM with structured output (cached by prompt + text)"""
+        cache_key = self.llm_cache_key(text, prompt)
+        cached = self.cache_get(cache_key)
+        if cached is not None:
+            logger.debug("LLM extraction served from cache")
+            return cached
+
         try:
-            print(f"DEBUG: Preparing LLM call with text length: {len(text)}")
+            logger.debug("Preparing LLM call with text length: %s", len(text))
             messages = [
                 {"role": "system", "content": prompt},
-                {"role": "user", "content": f"Extract key fields from this text:\n\n{text[:4000]}"}
+                {"role": "user", "content": f"Extract key fields from this text:\n\n{text[:LLM_TEXT_LIMIT]}"}
             ]
 
-            print("DEBUG: Making LLM API call...")
+            logger.debug("Making LLM API call...")
             response = self.throttled_llm(messages)
             content = response.choices[0].message.content or ""
-            print(f"DEBUG: LLM response: {content}")
+            logger.debug("LLM response: %s", content)
 
             # Parse the structured output
             parsed_result = self.parse_llm_output(content)
-            print(f"DEBUG: Parsed result: {parsed_result}")
+            logger.debug("Parsed result: %s", parsed_result)
+            # An empty or garbled reply parses to {}; don't pin that for the whole TTL
+            if parsed_result:
+                self.cache_set(cache_key, parsed_result)
             return parsed_result
 
         except Exception as e:
-            print(f"DEBUG: LLM extraction failed: {str(e)}")
+            logger.debug("LLM extraction failed: %s", e)
             return {"error": f"LLM extraction failed: {str(e)}"}
 
     def parse_llm_output(self, content: str) -> Dict:
         """Parse LLM output into structured data - FIXED VERSION"""
-        print(f"DEBUG: Parsing LLM content: {content[:200]}...")
+        logger.debug("Parsing LLM content: %s...", content[:200])
 
         # Clean the content - remove markdown code blocks
-        content = content.strip()
-        if content.startswith('```json'):
-            content = content[7:]
-        if content.startswith('```'):
-            content = content[3:]
-        if content.endswith('```'):
-            content = content[:-3]
-
-        content = content.strip()
-        print(f"DEBUG: Cleaned content: {content[:200]}...")
+        content = RE_CODE_FENCE.sub('', content.strip()).strip()
+        logger.debug("Cleaned content: %s...", content[:200])
 
         # Try to parse JSON first
         try:
-            parsed = json.loads(content)
-            print(f"DEBUG: Successfully parsed JSON: {parsed}")
+            parsed = orjson.loads(content)
+            logger.debug("Successfully parsed JSON: %s", parsed)
             return parsed
-        except json.JSONDecodeError as e:
-            print(f"DEBUG: JSON parsing failed: {e}")
-            print(f"DEBUG: Falling back to regex parsing...")
+        except orjson.JSONDecodeError as e:
+            logger.debug("JSON parsing failed: %s", e)
+            logger.debug("Falling back to regex parsing...")
 
         # Fall back to field parsing
         data = {}
         lines = [line.strip() for line in content.split('\n') if line.strip()]
 
         for line in lines:
-            # Match **Field:** value or Field: value
-            match = re.match(r'^\*\*(.+?)\*\*:\s*(.+)', line)
-            if not match:
-                match = re.match(r'^(.+?):\s*(.+)', line)
+            # Match **Field**: value or Field: value
+            match = RE_LLM_FIELD.match(line)
 
             if match:
-                key = match.group(1).strip().lower().replace(' ', '_')
-                value = match.group(2).strip()
+                bold_key, plain_key, value = match.groups()
+                key = (bold_key or plain_key).strip().lower().replace(' ', '_')
+                value = value.strip()
                 value = value.strip('"').strip("'").rstrip(',')
                 if value and value != 'null' and value != 'N/A':
                     data[key] = value
 
-        print(f"DEBUG: Final parsed data: {data}")
+        logger.debug("Final parsed data: %s", data)
         return data
 
-    def consolidate_person_data(self, segment_result: Dict, person_records: Dict):
-        """Cross-reference person data across segments"""
-        extracted_data = segment_result['extracted_data']
+    def resolve_person_name(self, document_type: str, extracted_data: Dict) -> Optional[str]:
+        """Holder's name from extracted fields, using the document type's own name fields first"""
+        person_name = None
 
-        print(f"DEBUG: Consolidating person data from extracted_data: {extracted_data}")
+        name_fields = PERSON_NAME_FIELDS.get(document_type)
+        if name_fields:
+            given_keys, family_keys, partial_ok = name_fields
+            given = str(first_present(extracted_data, given_keys) or '').strip()
+            family = str(first_present(extracted_data, family_keys) or '').strip()
+            if (given and family) or partial_ok:
+                person_name = f"{given} {family}".strip()
+
+        return person_name or (
+            first_present(extracted_data, PERSON_NAME_KEYS) or
+            f"{extracted_data.get('first_name', '')} {extracted_data.get('last_name', '')}".strip() or
+            f"{extracted_data.get('given_name', '')} {extracted_data.get('surname', '')}".strip() or
+            None
+        )
 
-        # Enhanced person name extraction for different document types
-        document_type = segment_result['document_type']
-        person_name = None
+    def consolidate_person_data(self, segment_result: Dict, person_records: Dict,
+                                person_index: Optional[Dict[Tuple[str, Any], str]] = None):
+        """Cross-reference person data across segments
 
-        # Try different field combinations based on document type
-        if document_type == 'I94':
-            first = (extracted_data.get('first_name') or
-                     extracted_data.get('first_given_name') or
-                     extracted_data.get('given_name', '')).strip()
-            last = (extracted_data.get('last_name') or
-                    extracted_data.get('lastsurname') or
-                    extracted_data.get('surname', '')).strip()
-            if first and last:
-                person_name = f"{first} {last}"
-            elif first:
-                person_name = first
-            elif last:
-                person_name = last
-
-        elif document_type in ['I797', 'I797C']:
-            person_name = extracted_data.get('beneficiary')
-
-        elif document_type == 'I129':
-            given = extracted_data.get('given_name') or extracted_data.get('given_name_first_name', '')
-            family = extracted_data.get('family_name') or extracted_data.get('family_name_last_name', '')
-            if given and family:
-                person_name = f"{given} {family}"
-
-        elif document_type in ['EAD', 'GREEN_CARD']:
-            person_name = extracted_data.get('full_name')
-
-        elif document_type in ['US_PASSPORT', 'FOREIGN_PASSPORT']:
-            person_name = extracted_data.get('holder_name')
-
-        elif document_type == 'VISA_STAMP':
-            given = extracted_data.get('given_name', '')
-            surname = extracted_data.get('surname', '')
-            if given and surname:
-                person_name = f"{given} {surname}"
+        person_index maps person_match_key values to keys of person_records; pass the same
+        dict for every segment of a file to avoid rebuilding it from the records each call.
+        """
+        extracted_data = segment_result['extracted_data']
 
-        if not person_name:
-            person_name = (
-                extracted_data.get('beneficiary') or
-                extracted_data.get('full_name') or
-                extracted_data.get('holder_name') or
-                f"{extracted_data.get('first_name', '')} {extracted_data.get('last_name', '')}".strip() or
-                f"{extracted_data.get('given_name', '')} {extracted_data.get('surname', '')}".strip() or
-                None
-            )
+        logger.debug("Consolidating person data from extracted_data: %s", extracted_data)
+
+        document_type = segment_result['document_type']
+        person_name = self.resolve_person_name(document_type, extracted_data)
 
-        dob = (extracted_data.get('date_of_birth') or
-               extracted_data.get('birth_date') or
-               extracted_data.get('date_of_birth_mmddyyyy'))
+        dob = first_present(extracted_data, DATE_OF_BIRTH_KEYS)
 
-        print(f"DEBUG: Extracted person name: '{person_name}', DOB: '{dob}'")
-        print(f"DEBUG: Document type: {document_type}")
-        print(f"DEBUG: Available fields: {list(extracted_data.keys())}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Extracted person name: '%s', DOB: '%s'", person_name, dob)
+            logger.debug("Document type: %s", document_type)
+            logger.debug("Available fields: %s", list(extracted_data.keys()))
 
         if not person_name:
-            print("DEBUG: No person name found, skipping person record creation")
+            logger.debug("No person name found, skipping person record creation")
             return
 
-        person_key = f"{person_name}_{dob}" if dob else person_name
+        if person_index is None:
+            person_index = {
+                person_match_key(record['name'], record['date_of_birth']): key
+                for key, record in person_records.items()
+            }
+
+        # Records keep the first spelling seen; later variants of it join that record
+        match_key = person_match_key(person_name, dob)
+        person_key = person_index.get(match_key)
 
-        if person_key not in person_records:
+        if person_key is None:
+            person_key = f"{person_name}_{dob}" if dob else person_name
+            person_index[match_key] = person_key
             person_records[person_key] = {
                 'name': person_name,
                 'date_of_birth': dob,
@@ -765,24 +1350,22 @@ class DocumentProcessor:
                 'timeline': [],
                 'inconsistencies': []
             }
-            print(f"DEBUG: Created new person record for: {person_key}")
+            logger.debug("Created new person record for: %s", person_key)
 
         person_record = person_records[person_key]
 
+        identity_fields = segment_result.get('identity_fields')
+        if identity_fields is None:
+            identity_fields = normalize_person_fields(extracted_data)
+
         person_record['documents'].append({
             'type': segment_result['document_type'],
             'pages': segment_result['pages'],
-            'data': extracted_data
+            'data': extracted_data,
+            'identity_fields': identity_fields
         })
 
-        doc_date_raw = (
-            extracted_data.get('notice_date') or
-            extracted_data.get('issue_date') or
-            extracted_data.get('received_date') or
-            extracted_data.get('arrival_date') or
-            extracted_data.get('arrivalissued_date') or
-            extracted_data.get('expiration_date')
-        )
+        doc_date_raw = first_present(extracted_data, TIMELINE_DATE_KEYS)
 
         parsed_doc_date = parse_date_flexible(doc_date_raw)
 
@@ -794,13 +1377,11 @@ class DocumentProcessor:
                 'event': f"{segment_result['document_type']} processed"
             })
 
-            person_record['timeline'].sort(
-                key=lambda x: x.get('parsed_date') or date.min
-            )
+        # A single document can't disagree with itself
+        if len(person_record['documents']) >= 2:
+            self.check_person_data_consistency(person_record)
 
-        self.check_person_data_consistency(person_record)
-
-        print(f"DEBUG: Updated person record: {person_record}")
+        logger.debug("Updated person record: %s", person_record)
 
     def check_person_data_consistency(self, person_record: Dict):
         """Check for data inconsistencies across documents"""
@@ -810,52 +1391,43 @@ class DocumentProcessor:
         if len(documents) < 2:
             return
 
-        # Check name consistency
-        names = []
+        # Collect names, DOBs and citizenship in one pass over the documents, from the identity
+        # fields normalised at extraction so case, spacing and date-format differences don't count
+        names, dobs, countries = set(), set(), set()
         for doc in documents:
-            name = (doc['data'].get('beneficiary') or
-                    doc['data'].get('full_name') or
-                    doc['data'].get('holder_name'))
+            data = doc['identity_fields']
+            name = first_present(data, PERSON_NAME_KEYS)
             if name:
-                names.append(name)
-
-        unique_names = set(filter(None, names))
-        if len(unique_names) > 1:
-            inconsistencies.append(f"Name variations: {', '.join(unique_names)}")
-
-        # Check DOB consistency
-        dobs = []
-        for doc in documents:
-            dob = (doc['data'].get('date_of_birth') or
-                   doc['data'].get('birth_date'))
+                names.add(name)
+            dob = first_present(data, DATE_OF_BIRTH_KEYS[:2])
             if dob:
-                dobs.append(dob)
-
-        unique_dobs = set(filter(None, dobs))
-        if len(unique_dobs) > 1:
-            inconsistencies.append(f"DOB variations: {', '.join(map(str, unique_dobs))}")
-
-        # Check citizenship consistency
-        countries = []
-        for doc in documents:
-            country = (doc['data'].get('country_of_citizenship') or
-                       doc['data'].get('country_of_birth') or
-                       doc['data'].get('nationality'))
+                dobs.add(dob)
+            country = first_present(data, CITIZENSHIP_KEYS)
             if country:
-                countries.append(country)
+                countries.add(country)
 
-        unique_countries = set(filter(None, countries))
-        if len(unique_countries) > 1:
-            inconsistencies.append(f"Country variations: {', '.join(unique_countries)}")
+        if len(names) > 1:
+            inconsistencies.append(f"Name variations: {', '.join(names)}")
+        if len(dobs) > 1:
+            inconsistencies.append(f"DOB variations: {', '.join(map(str, dobs))}")
+        if len(countries) > 1:
+            inconsistencies.append(f"Country variations: {', '.join(countries)}")
 
         person_record['inconsistencies'] = inconsistencies
 
+    def sort_timelines(self, person_records: Dict):
+        """Order each person's timeline by date (entries are appended unsorted during consolidation)"""
+        for person_data in person_records.values():
+            person_data['timeline'].sort(key=lambda x: x.get('parsed_date') or date.min)
+
     def generate_audit_summary(self, results: Dict) -> Dict:
         """Generate comprehensive audit summary"""
+        self.sort_timelines(results['person_records'])
+
         summary = {
             'file_overview': {
                 'total_pages': sum(len(doc['pages']) for doc in results['documents_processed']),
-                'document_types_found': {},
+                'document_types_found': dict(Counter(doc['document_type'] for doc in results['documents_processed'])),
                 'people_identified': len(results['person_records']),
                 'date_range': self.get_document_date_range(results),
             },
@@ -864,11 +1436,6 @@ class DocumentProcessor:
             'recommendations': []
         }
 
-        for doc in results['documents_processed']:
-            doc_type = doc['document_type']
-            summary['file_overview']['document_types_found'][doc_type] = \
-                summary['file_overview']['document_types_found'].get(doc_type, 0) + 1
-
         for person_key, person_data in results['person_records'].items():
             completeness = check_case_completeness(person_data)
             summary['completeness_check'][person_key] = completeness
@@ -885,46 +1452,52 @@ class DocumentProcessor:
 
     def get_document_date_range(self, results: Dict) -> Dict:
         """Get date range of all documents"""
-        all_dates: List[date] = []
+        earliest: Optional[date] = None
+        latest: Optional[date] = None
 
         for person_data in results['person_records'].values():
             for timeline_entry in person_data['timeline']:
-                parsed = timeline_entry.get('parsed_date')
-                if not parsed:
+                # Entries built here carry parsed_date; only timelines assembled elsewhere need parsing
+                if 'parsed_date' in timeline_entry:
+                    parsed = timeline_entry['parsed_date']
+                else:
                     parsed = parse_date_flexible(timeline_entry.get('date'))
-                if parsed:
-                    all_dates.append(parsed)
+                if not parsed:
+                    continue
+                if earliest is None or parsed < earliest:
+                    earliest = parsed
+                if latest is None or parsed > latest:
+                    latest = parsed
 
-        if not all_dates:
+        if earliest is None:
             return {'earliest': None, 'latest': None}
 
-        all_dates.sort()
         return {
-            'earliest': all_dates[0].isoformat(),
-            'latest': all_dates[-1].isoformat()
+            'earliest': earliest.isoformat(),
+            'latest': latest.isoformat()
         }
 
     def generate_audit_recommendations(self, summary: Dict, results: Dict) -> List[str]:
         """Generate audit recommendations"""
-        recommendations = []
-
-        for person_key, completeness in summary['completeness_check'].items():
-            if completeness.get('missing_documents'):
-                recommendations.append(
-                    f"{person_key}: Consider obtaining {', '.join(completeness['missing_documents'])}"
-                )
+        recommendations = [
+            f"{person_key}: Consider obtaining {', '.join(completeness['missing_documents'])}"
+            for person_key, completeness in summary['completeness_check'].items()
+            if completeness.get('missing_documents')
+        ]
 
         if summary['red_flags']:
             recommendations.append("Review flagged data inconsistencies before proceeding")
 
         return recommendations
 
-    def process_single_document(self, file_path: str, document_type: str, options: Dict) -> Dict:
-        """Process file as single document type"""
+    def process_single_document(self, file_path: PdfSource, document_type: str, options: Dict) -> Dict:
+        """Process file (path or PDF bytes) as single document type"""
+        # Comes from the request form; intern it like segment types
+        document_type = sys.intern(document_type)
         results = {
-            'processing_id': str(uuid.uuid4()),
-            'file_path': os.path.basename(file_path),
-            'processed_at': datetime.utcnow().isoformat(),
+            'processing_id': uuid.uuid4().hex,
+            'file_path': self.pdf_source_name(file_path),
+            'processed_at': datetime.now(timezone.utc).isoformat(),
             'document_type': document_type,
             'extracted_data': {},
             'validation_results': {},
@@ -935,121 +1508,70 @@ class DocumentProcessor:
             'validation_errors': []
         }
 
-        print(f"DEBUG: Processing single document, type: {document_type}")
+        logger.debug("Processing single document, type: %s", document_type)
+
+        # Each stage fails on its own: work already done (OCR, LLM extraction) is kept in the
+        # results, and later stages still run when their inputs are intact
 
+        # Stage 1: text (and document type when auto-detecting); nothing else can run without it
         try:
             extraction_result = self.extract_text_multi_method(file_path)
             text = extraction_result['text']
-            print(f"DEBUG: Extracted text length: {len(text)}")
+            logger.debug("Extracted text length: %s", len(text))
 
             if document_type == 'auto':
-                print("DEBUG: Auto-detecting document type...")
+                logger.debug("Auto-detecting document type...")
                 segments, _ = self.analyze_pdf_by_pages(file_path)
                 if segments:
                     document_type = segments[0].doc_type
                     text = segments[0].text
                     results['document_type'] = document_type
-                    print(f"DEBUG: Auto-detected document type: {document_type}")
-
-            print(f"DEBUG: Processing document as type: {document_type}")
-            if document_type in ['I797', 'I797C']:
-                results['extracted_data'] = self.extract_uscis_form_data(text)
-            elif document_type == 'I129':
-                results['extracted_data'] = self.extract_i129_data(text)
-            elif document_type in ['PERM', 'PWD']:
-                results['extracted_data'] = self.extract_dol_form_data(text)
-            elif document_type == 'LCA':
-                results['extracted_data'] = self.extract_lca_data(text)
-            elif document_type == 'I94':
-                results['extracted_data'] = self.extract_i94_data(text)
-            elif document_type == 'EAD':
-                results['extracted_data'] = self.extract_ead_data(text)
-            elif document_type == 'GREEN_CARD':
-                results['extracted_data'] = self.extract_green_card_data(text)
-            elif document_type in ['US_PASSPORT', 'FOREIGN_PASSPORT']:
-                results['extracted_data'] = self.extract_passport_data(text)
-            elif document_type == 'VISA_STAMP':
-                results['extracted_data'] = self.extract_visa_data(text)
-            else:
-                results['extracted_data'] = self.extract_generic_data(text)
+                    logger.debug("Auto-detected document type: %s", document_type)
+        except Exception as e:
+            self.record_processing_error(results, 'text extraction', e)
+            return results
 
-            print(f"DEBUG: Final extracted data: {results['extracted_data']}")
+        # Stage 2: field extraction
+        try:
+            logger.debug("Processing document as type: %s", document_type)
+            results['extracted_data'] = self.extract_document_data(document_type, text)
+            logger.debug("Final extracted data: %s", results['extracted_data'])
+        except Exception as e:
+            self.record_processing_error(results, 'field extraction', e)
+            return results
 
-            if options.get('validate_fields', True):
-                results['validation_results'] = validate_segment_data(
-                    results['extracted_data'], document_type
-                )
+        extracted_data = results['extracted_data']
 
-            results['documents_processed'] = [{
-                'pages': [0],
-                'document_type': document_type,
-                'confidence': 0.8,
-                'extracted_data': results['extracted_data'],
-                'validation_results': results['validation_results'],
-                'processing_notes': results['processing_notes']
-            }]
+        if options.get('validate_fields', True):
+            try:
+                results['validation_results'] = validate_segment_data(extracted_data, document_type)
+            except Exception as e:
+                self.record_processing_error(results, 'validation', e)
 
-            extracted_data = results['extracted_data']
-
-            person_name = None
-            if document_type == 'I94':
-                first = (extracted_data.get('first_name') or
-                         extracted_data.get('first_given_name') or
-                         extracted_data.get('given_name', '')).strip()
-                last = (extracted_data.get('last_name') or
-                        extracted_data.get('lastsurname') or
-                        extracted_data.get('surname', '')).strip()
-                if first and last:
-                    person_name = f"{first} {last}"
-                elif first:
-                    person_name = first
-                elif last:
-                    person_name = last
-
-            elif document_type in ['I797', 'I797C']:
-                person_name = extracted_data.get('beneficiary')
-
-            elif document_type == 'I129':
-                given = extracted_data.get('given_name') or extracted_data.get('given_name_first_name', '')
-                family = extracted_data.get('family_name') or extracted_data.get('family_name_last_name', '')
-                if given and family:
-                    person_name = f"{given} {family}"
-
-            elif document_type in ['EAD', 'GREEN_CARD']:
-                person_name = extracted_data.get('full_name')
-
-            elif document_type in ['US_PASSPORT', 'FOREIGN_PASSPORT']:
-                person_name = extracted_data.get('holder_name')
-
-            elif document_type == 'VISA_STAMP':
-                given = extracted_data.get('given_name', '')
-                surname = extracted_data.get('surname', '')
-                if given and surname:
-                    person_name = f"{given} {surname}"
-
-            if not person_name:
-                person_name = (
-                    extracted_data.get('beneficiary') or
-                    extracted_data.get('full_name') or
-                    extracted_data.get('holder_name') or
-                    f"{extracted_data.get('first_name', '')} {extracted_data.get('last_name', '')}".strip() or
-                    f"{extracted_data.get('given_name', '')} {extracted_data.get('surname', '')}".strip() or
-                    None
+        results['documents_processed'] = [{
+            'pages': [0],
+            'document_type': document_type,
+            'confidence': 0.8,
+            'extracted_data': extracted_data,
+            'identity_fields': normalize_person_fields(extracted_data),
+            'validation_results': results['validation_results'],
+            'processing_notes': results['processing_notes']
+        }]
+
+        # Stage 3: person record
+        try:
+            person_name = self.resolve_person_name(document_type, extracted_data)
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Person name components: %s, final person_name: '%s'",
+                    {key: extracted_data.get(key) for key in
+                     ('beneficiary', 'full_name', 'first_name', 'last_name', 'given_name', 'surname')},
+                    person_name,
                 )
 
-            print("DEBUG: Person name components:")
-            print(f"  beneficiary: {extracted_data.get('beneficiary')}")
-            print(f"  full_name: {extracted_data.get('full_name')}")
-            print(f"  first_name: {extracted_data.get('first_name')}")
-            print(f"  last_name: {extracted_data.get('last_name')}")
-            print(f"  given_name: {extracted_data.get('given_name')}")
-            print(f"  surname: {extracted_data.get('surname')}")
-            print(f"  final person_name: '{person_name}'")
-
             if person_name:
-                dob = (extracted_data.get('date_of_birth') or
-                       extracted_data.get('birth_date') or
-                       extracted_data.get('date_of_birth_mmddyyyy'))
+                dob = first_present(extracted_data, DATE_OF_BIRTH_KEYS)
 
                 person_key = f"{person_name}_{dob}" if dob else person_name
                 results['person_records'][person_key] = {
@@ -1058,19 +1580,14 @@ class DocumentProcessor:
                     'documents': [{
                         'type': document_type,
                         'pages': [0],
-                        'data': extracted_data
+                        'data': extracted_data,
+                        'identity_fields': results['documents_processed'][0]['identity_fields']
                     }],
                     'timeline': [],
                     'inconsistencies': []
                 }
 
-                doc_date_raw = (
-                    extracted_data.get('notice_date') or
-                    extracted_data.get('issue_date') or
-                    extracted_data.get('received_date') or
-                    extracted_data.get('arrival_date') or
-                    extracted_data.get('expiration_date')
-                )
+                doc_date_raw = first_present(extracted_data, TIMELINE_DATE_KEYS)
                 parsed_doc_date = parse_date_flexible(doc_date_raw)
                 if parsed_doc_date:
                     results['person_records'][person_key]['timeline'].append({
@@ -1080,34 +1597,89 @@ class DocumentProcessor:
                         'event': f"{document_type} processed"
                     })
 
-                print(f"DEBUG: Created person record: {results['person_records'][person_key]}")
+                logger.debug("Created person record: %s", results['person_records'][person_key])
+        except Exception as e:
+            self.record_processing_error(results, 'person records', e)
 
+        # Stage 4: summary (same as multi-document runs: one page, one document type)
+        try:
+            results['processing_summary'] = self.generate_audit_summary(results)
+        except Exception as e:
+            self.record_processing_error(results, 'summary', e)
+
+        logger.debug(
+            "Final results summary - People: %s, Documents: %s",
+            len(results['person_records']), len(results['documents_processed'])
+        )
+
+        return results
+
+    def record_processing_error(self, results: Dict, stage: str, error: Exception):
+        """Note a failed processing stage in the results"""
+        logger.debug("Processing error in %s: %s", stage, error)
+        message = f"Processing error ({stage}): {error}"
+        results['processing_notes'].append(message)
+        results['validation_errors'].append(message)
+
+    def normalize_single_to_multi(self, results: Dict) -> Dict:
+        """Fill in any multi-document fields missing from single-document results"""
+        document_type = results.get('document_type', 'UNKNOWN')
+        extracted_data = results.get('extracted_data', {})
+        get = extracted_data.get
+
+        person_name = (
+            first_present(extracted_data, PERSON_NAME_KEYS) or
+            " ".join(filter(None, [get('first_name'), get('last_name')]))
+        )
+        summary_date = first_present(extracted_data, DOCUMENT_DATE_KEYS[:2])
+        doc_date = first_present(extracted_data, DOCUMENT_DATE_KEYS)
+
+        if 'processing_summary' not in results:
             results['processing_summary'] = {
                 'file_overview': {
-                    'total_pages': 1,
+                    'total_pages': 1,  # Single document
                     'document_types_found': {document_type: 1},
-                    'people_identified': len(results['person_records']),
-                    'date_range': self.get_document_date_range(results)
+                    'people_identified': 1 if person_name else 0,
+                    'date_range': {'earliest': summary_date, 'latest': summary_date}
                 },
                 'completeness_check': {},
                 'red_flags': [],
                 'recommendations': []
             }
 
-            for person_key, person_data in results['person_records'].items():
-                completeness = check_case_completeness(person_data)
-                results['processing_summary']['completeness_check'][person_key] = completeness
+        if 'documents_processed' not in results:
+            results['documents_processed'] = [{
+                'pages': [0],  # Single document, page 0
+                'document_type': document_type,
+                'confidence': 0.8,
+                'extracted_data': extracted_data,
+                'validation_results': results.get('validation_results', {}),
+                'processing_notes': results.get('processing_notes', [])
+            }]
 
-            results['processing_summary']['recommendations'] = self.generate_audit_recommendations(
-                results['processing_summary'], results
-            )
+        if 'person_records' not in results:
+            results['person_records'] = {}
+            if person_name:
+                date_of_birth = get('date_of_birth')
+                person_record = {
+                    'name': person_name,
+                    'date_of_birth': date_of_birth,
+                    'documents': [{'type': document_type, 'pages': [0], 'data': extracted_data}],
+                    'timeline': [],
+                    'inconsistencies': []
+                }
 
-            print(
-                f"DEBUG: Final results summary - People: {len(results['person_records'])}, Documents: {len(results['documents_processed'])}")
+                parsed_doc_date = parse_date_flexible(doc_date) if doc_date else None
+                if parsed_doc_date:
+                    person_record['timeline'].append({
+                        'date': doc_date,
+                        'parsed_date': parsed_doc_date,
+                        'document': document_type,
+                        'event': f"{document_type} processed"
+                    })
+                results['person_records'][f"{person_name}_{date_of_birth or ''}"] = person_record
 
-        except Exception as e:
-            print(f"DEBUG: Processing error: {str(e)}")
-            results['processing_notes'].append(f"Processing error: {str(e)}")
-            results['validation_errors'].append(f"Processing error: {str(e)}")
+        if 'validation_errors' not in results:
+            results['validation_errors'] = []
 
         return results
@@ -0,0 +1,38 @@
+"""In-process LRU cache kept in front of the shared Redis/SQLite cache (also holds debug pages)"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class ExtractionCache:
+    """Bounded least-recently-used map of cache key -> serialized value.
+
+    Values are the same JSON bytes the shared cache stores, so every hit is decoded into
+    a fresh object and callers can't modify each other's results. Safe to share between
+    the threads that extract segments concurrently.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,56 @@
+"""SQLite-backed key/value cache used when Redis isn't configured"""
+
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Optional
+
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires_at REAL NOT NULL
+    )
+"""
+
+CREATE_INDEX_SQL = "CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)"
+
+SELECT_SQL = "SELECT value FROM cache WHERE key = ? AND expires_at > ?"
+
+UPSERT_SQL = "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)"
+
+# Expired rows are removed on every write, so the file never outgrows one TTL's worth of entries
+PURGE_EXPIRED_SQL = "DELETE FROM cache WHERE expires_at <= ?"
+
+
+class SQLiteCache:
+    """The get/setex subset of the redis client interface, stored in a local SQLite file.
+
+    A connection is opened per call, so one instance can be shared by threads and the
+    file by several worker processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self.connect()) as conn, conn:
+            conn.execute(CREATE_TABLE_SQL)
+            conn.execute(CREATE_INDEX_SQL)
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with closing(self.connect()) as conn:
+            row = conn.execute(SELECT_SQL, (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def setex(self, key: str, ttl: int, value: bytes):
+        now = time.time()
+        with closing(self.connect()) as conn, conn:
+            conn.execute(PURGE_EXPIRED_SQL, (now,))
+            conn.execute(UPSERT_SQL, (key, value, now + ttl))
@@ -1,19 +1,74 @@
 import re
+import sys
+import time
+import queue
+import atexit
 import logging
+import functools
 from datetime import datetime, date
-from typing import Dict, Any, Optional, List
-from logging.handlers import RotatingFileHandler
+from typing import Dict, Any, Optional, List, Tuple
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 
+# Identifier formats, compiled once at import rather than looked up in re's cache per call
+RE_RECEIPT_NUMBER_FORMAT = re.compile(r'^(MSC|NBC|EAC|WAC|IOE)\d{10}$', re.IGNORECASE)
+RE_I94_NUMBER = re.compile(r'^\d{11}$')
+RE_US_PASSPORT_NUMBER = re.compile(r'^[A-Z]?\d{8,9}$', re.IGNORECASE)
+RE_PASSPORT_NUMBER = re.compile(r'^[A-Z0-9]{6,12}$', re.IGNORECASE)
+
+# Values the LLM uses for a missing date (compared lowercased)
+DATE_PLACEHOLDERS = frozenset({'null', 'n/a'})
+
+# Compact "19DEC1994" dates (common on I-94s), parsed directly through a month table
+RE_DDMMMYYYY = re.compile(r'^(\d{1,2})([A-Za-z]{3})(\d{4})$')
+MONTH_ABBREVIATIONS = {
+    'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+    'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12,
+}
+
+# Dates embedded in longer text, tried when no whole-string format matches; the named
+# group that matched tells YYYY-MM-DD from MM/DD/YYYY so the text is scanned only once
+RE_EMBEDDED_DATE = re.compile(r'(?P<ymd>\d{4}-\d{2}-\d{2})|(?P<mdy>\d{1,2}/\d{1,2}/\d{4})')
+EMBEDDED_DATE_FORMATS = {'ymd': '%Y-%m-%d', 'mdy': '%m/%d/%Y'}
+
+# strptime formats parse_date_flexible tries in order (ambiguous and rare formats last)
+DATE_FORMATS = (
+    "%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%d-%b-%Y", "%d-%B-%Y",
+    "%d %b %Y", "%d %B %Y", "%Y %B %d", "%b %d %Y", "%B %d %Y",
+    "%m/%d/%y", "%d/%m/%Y"
+)
+
+# Loose regex for what each strptime directive can match (a superset, so a failed probe means
+# strptime would have failed too); a space in a format matches any run of whitespace
+DATE_SHAPE_TOKENS = {
+    '%Y': r'\d{4}', '%y': r'\d{2}', '%m': r'\d{1,2}', '%d': r' ?\d{1,2}',
+    '%b': r'[A-Za-z]+', '%B': r'[A-Za-z]+', ' ': r'\s+',
+}
+
+
+def date_format_shape(fmt: str):
+    """Compiled regex that matches every string strptime could parse with fmt"""
+    return re.compile(re.sub(r'%[A-Za-z]| ', lambda m: DATE_SHAPE_TOKENS[m.group()], fmt))
+
+
+# (shape, format) pairs: a cheap regex probe decides whether strptime (and its ValueError) is worth trying
+DATE_FORMAT_SHAPES = tuple((date_format_shape(fmt), fmt) for fmt in DATE_FORMATS)
+
 def setup_logging(app):
-    """Setup comprehensive logging"""
+    """Setup comprehensive logging (file writes happen on a background listener thread)"""
     if not app.debug:
         file_handler = RotatingFileHandler('logs/app.log', maxBytes=10485760, backupCount=5)
         file_handler.setFormatter(logging.Formatter(
             '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
         ))
         file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
+
+        # Request threads only enqueue records; the listener does the disk I/O
+        log_queue = queue.Queue(-1)
+        listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        app.logger.addHandler(QueueHandler(log_queue))
         app.logger.setLevel(logging.INFO)
         app.logger.info('Immigration Audit App startup')
 
@@ -22,8 +77,13 @@ def validate_receipt_number(receipt_number: str) -> bool:
     """Validate USCIS receipt numbers"""
     if not receipt_number:
         return False
-    pattern = r'^(MSC|NBC|EAC|WAC|IOE)\d{10}$'
-    return bool(re.match(pattern, receipt_number, re.IGNORECASE))
+    return bool(RE_RECEIPT_NUMBER_FORMAT.match(receipt_number))
+
+
+def validate_receipt_numbers(receipt_numbers: List[str]) -> List[bool]:
+    """Validate many USCIS receipt numbers in one pass (one result per input, in order)"""
+    match = RE_RECEIPT_NUMBER_FORMAT.match
+    return [bool(receipt_number) and match(receipt_number) is not None for receipt_number in receipt_numbers]
 
 
 def validate_i94_number(i94_number: str) -> bool:
@@ -31,7 +91,7 @@ def validate_i94_number(i94_number: str) -> bool:
     if not i94_number:
         return False
     cleaned = i94_number.replace('-', '').replace(' ', '')
-    return bool(re.match(r'^\d{11}$', cleaned))
+    return bool(RE_I94_NUMBER.match(cleaned))
 
 
 def validate_passport_number(passport_num: str, country: str = None) -> bool:
@@ -41,10 +101,10 @@ def validate_passport_number(passport_num: str, country: str = None) -> bool:
 
     if country and country.upper() == 'USA':
         # US passports: 9 digits or 1 letter + 8 digits
-        return bool(re.match(r'^[A-Z]?\d{8,9}$', passport_num.upper()))
+        return bool(RE_US_PASSPORT_NUMBER.match(passport_num))
 
     # General validation: 6-12 alphanumeric
-    return bool(re.match(r'^[A-Z0-9]{6,12}$', passport_num.upper()))
+    return bool(RE_PASSPORT_NUMBER.match(passport_num))
 
 
 def validate_date_range(start_date: date, end_date: date) -> bool:
@@ -54,162 +114,231 @@ def validate_date_range(start_date: date, end_date: date) -> bool:
     return True
 
 
+@functools.lru_cache(maxsize=1)
+def year_for_hour(hour: int) -> int:
+    """Current year, computed once per hour bucket (the argument only keys the cache)"""
+    return datetime.now().year
+
+
 def validate_date_reasonable(check_date: date, field_name: str = "") -> bool:
     """Validate date is within reasonable range"""
     if not check_date:
         return True
 
-    current_year = datetime.now().year
+    current_year = year_for_hour(int(time.monotonic() // 3600))
     if check_date.year < 1900 or check_date.year > current_year + 10:
         return False
 
     return True
 
 
-def validate_segment_data(data: Dict[str, Any], doc_type: str) -> Dict[str, Any]:
-    """Validate extracted data for a document segment"""
-    validation_results = {
+def record_field_check(validation_results: Dict[str, Any], field: str, valid: bool) -> int:
+    """Record one field as valid or invalid, returning 1 if valid else 0"""
+    validation_results['valid_fields' if valid else 'invalid_fields'].append(field)
+    return int(valid)
+
+
+def validate_uscis_fields(data: Dict[str, Any], validation_results: Dict[str, Any],
+                          receipt_valid: Optional[bool] = None) -> Tuple[int, int]:
+    """USCIS document validation (I-797, I-797C, I-129); returns (fields checked, fields valid).
+    receipt_valid is the receipt number's already-known validity, when checked in bulk."""
+    total_fields = 0
+    valid_fields = 0
+
+    receipt_num = data.get('receipt_number')
+    if receipt_num:
+        if receipt_valid is None:
+            receipt_valid = validate_receipt_number(receipt_num)
+        total_fields += 1
+        valid_fields += record_field_check(validation_results, 'receipt_number', receipt_valid)
+
+    # Date validations
+    notice_date = parse_date_flexible(data.get('notice_date'))
+    received_date = parse_date_flexible(data.get('received_date'))
+
+    if notice_date:
+        total_fields += 1
+        valid_fields += record_field_check(
+            validation_results, 'notice_date', validate_date_reasonable(notice_date, 'notice_date')
+        )
+
+    if received_date:
+        total_fields += 1
+        valid_fields += record_field_check(
+            validation_results, 'received_date', validate_date_reasonable(received_date, 'received_date')
+        )
+
+    # Date sequence validation
+    if notice_date and received_date:
+        if not validate_date_range(received_date, notice_date):
+            validation_results['warnings'].append(
+                'Notice date is before received date'
+            )
+
+    return total_fields, valid_fields
+
+
+def validate_i94_fields(data: Dict[str, Any], validation_results: Dict[str, Any]) -> Tuple[int, int]:
+    """I-94 validation; returns (fields checked, fields valid)"""
+    i94_num = data.get('admission_record_number') or data.get('admission_i94_record_number')
+    if not i94_num:
+        return 0, 0
+    return 1, record_field_check(validation_results, 'admission_record_number', validate_i94_number(i94_num))
+
+
+def validate_passport_fields(data: Dict[str, Any], validation_results: Dict[str, Any],
+                             default_country: Optional[str] = None) -> Tuple[int, int]:
+    """Passport validation; returns (fields checked, fields valid)"""
+    passport_num = data.get('passport_number')
+    if not passport_num:
+        return 0, 0
+    country = data.get('issuing_country', default_country)
+    return 1, record_field_check(
+        validation_results, 'passport_number', validate_passport_number(passport_num, country)
+    )
+
+
+def validate_ead_fields(data: Dict[str, Any], validation_results: Dict[str, Any]) -> Tuple[int, int]:
+    """EAD validation; returns (fields checked, fields valid)"""
+    uscis_num = data.get('uscis_number')
+    if not uscis_num:
+        return 0, 0
+    # Basic length check
+    return 1, record_field_check(validation_results, 'uscis_number', len(uscis_num) >= 8)
+
+
+# Field validator for each document type; types not listed have no field checks
+SEGMENT_VALIDATORS = {
+    'I797': validate_uscis_fields,
+    'I797C': validate_uscis_fields,
+    'I129': validate_uscis_fields,
+    'I94': validate_i94_fields,
+    'US_PASSPORT': functools.partial(validate_passport_fields, default_country='USA'),
+    'FOREIGN_PASSPORT': validate_passport_fields,
+    'EAD': validate_ead_fields,
+}
+
+
+def empty_validation_results() -> Dict[str, Any]:
+    """Validation results with no fields checked"""
+    return {
         'valid_fields': [],
         'invalid_fields': [],
         'warnings': [],
         'overall_score': 0.0
     }
 
-    total_fields = 0
-    valid_fields = 0
 
-    # USCIS document validation (I-797, I-797C, I-129)
-    if doc_type in ['I797', 'I797C', 'I129']:
-        receipt_num = data.get('receipt_number')
-        if receipt_num:
-            total_fields += 1
-            if validate_receipt_number(receipt_num):
-                validation_results['valid_fields'].append('receipt_number')
-                valid_fields += 1
-            else:
-                validation_results['invalid_fields'].append('receipt_number')
-
-        # Date validations
-        notice_date = parse_date_flexible(data.get('notice_date'))
-        received_date = parse_date_flexible(data.get('received_date'))
-
-        if notice_date:
-            total_fields += 1
-            if validate_date_reasonable(notice_date, 'notice_date'):
-                validation_results['valid_fields'].append('notice_date')
-                valid_fields += 1
-            else:
-                validation_results['invalid_fields'].append('notice_date')
-
-        if received_date:
-            total_fields += 1
-            if validate_date_reasonable(received_date, 'received_date'):
-                validation_results['valid_fields'].append('received_date')
-                valid_fields += 1
-            else:
-                validation_results['invalid_fields'].append('received_date')
-
-        # Date sequence validation
-        if notice_date and received_date:
-            if not validate_date_range(received_date, notice_date):
-                validation_results['warnings'].append(
-                    'Notice date is before received date'
-                )
-
-    # I-94 validation
-    elif doc_type == 'I94':
-        i94_num = data.get('admission_record_number') or data.get('admission_i94_record_number')
-        if i94_num:
-            total_fields += 1
-            if validate_i94_number(i94_num):
-                validation_results['valid_fields'].append('admission_record_number')
-                valid_fields += 1
-            else:
-                validation_results['invalid_fields'].append('admission_record_number')
-
-    # Passport validation
-    elif doc_type in ['US_PASSPORT', 'FOREIGN_PASSPORT']:
-        passport_num = data.get('passport_number')
-        country = data.get('issuing_country', 'USA' if doc_type == 'US_PASSPORT' else None)
-
-        if passport_num:
-            total_fields += 1
-            if validate_passport_number(passport_num, country):
-                validation_results['valid_fields'].append('passport_number')
-                valid_fields += 1
-            else:
-                validation_results['invalid_fields'].append('passport_number')
-
-    # EAD validation
-    elif doc_type == 'EAD':
-        uscis_num = data.get('uscis_number')
-        if uscis_num:
-            total_fields += 1
-            if len(uscis_num) >= 8:  # Basic length check
-                validation_results['valid_fields'].append('uscis_number')
-                valid_fields += 1
-            else:
-                validation_results['invalid_fields'].append('uscis_number')
+def validate_segment_data(data: Dict[str, Any], doc_type: str) -> Dict[str, Any]:
+    """Validate extracted data for a document segment"""
+    validation_results = empty_validation_results()
+
+    validator = SEGMENT_VALIDATORS.get(doc_type)
+    if validator is None or not data:
+        return validation_results
+
+    total_fields, valid_fields = validator(data, validation_results)
 
     # Calculate overall score
     if total_fields > 0:
         validation_results['overall_score'] = valid_fields / total_fields
-    else:
-        validation_results['overall_score'] = 0.0
 
     return validation_results
 
 
+def validate_segments_batch(data_list: List[Dict[str, Any]], doc_types: List[str]) -> List[Dict[str, Any]]:
+    """Validate many segments at once (same results as validate_segment_data on each, in order).
+
+    Segments are grouped by document type so each validator is looked up once per group,
+    and every USCIS receipt number in the batch is checked in a single pass.
+    """
+    groups: Dict[str, List[int]] = {}
+    for index, doc_type in enumerate(doc_types):
+        groups.setdefault(doc_type, []).append(index)
+
+    batch_results: List[Optional[Dict[str, Any]]] = [None] * len(data_list)
+    for doc_type, indices in groups.items():
+        validator = SEGMENT_VALIDATORS.get(doc_type)
+        if validator is None:
+            for index in indices:
+                batch_results[index] = empty_validation_results()
+            continue
+
+        if validator is validate_uscis_fields:
+            receipts_valid = validate_receipt_numbers([data_list[i].get('receipt_number') for i in indices])
+            checks = [(i, {'receipt_valid': valid}) for i, valid in zip(indices, receipts_valid)]
+        else:
+            checks = [(i, {}) for i in indices]
+
+        for index, extra in checks:
+            validation_results = empty_validation_results()
+            if not data_list[index]:
+                batch_results[index] = validation_results
+                continue
+            total_fields, valid_fields = validator(data_list[index], validation_results, **extra)
+            if total_fields > 0:
+                validation_results['overall_score'] = valid_fields / total_fields
+            batch_results[index] = validation_results
+
+    return batch_results
+
+
+@functools.lru_cache(maxsize=4096)
 def parse_date_flexible(date_str: Optional[str]) -> Optional[date]:
-    """Parse date string with multiple format attempts"""
-    if not date_str or date_str.lower() in ['null', 'n/a', '']:
+    """Parse date string with multiple format attempts (memoised; the same field is parsed during
+    validation, timeline building and summary date ranges)"""
+    # Only short strings can be placeholders, so the common case skips lowercasing
+    if not date_str or (len(date_str) <= 4 and date_str.lower() in DATE_PLACEHOLDERS):
         return None
 
     # Clean the string
     date_str = date_str.strip()
 
-    # Handle formats like "19DEC1994"
-    ddmmmyyyy_match = re.match(r'^(\d{1,2})([A-Za-z]{3})(\d{4})$', date_str)
-    if ddmmmyyyy_match:
-        day, month, year = ddmmmyyyy_match.groups()
-        date_str = f"{day}-{month.title()}-{year}"
-
-    # Try various formats
-    formats = [
-        "%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%d-%b-%Y", "%d-%B-%Y",
-        "%d %b %Y", "%d %B %Y", "%Y %B %d", "%b %d %Y", "%B %d %Y",
-        "%m/%d/%y", "%d/%m/%Y"
-    ]
-
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt).date()
-        except ValueError:
-            continue
-
-    # Last attempt: extract date patterns
-    ymd_match = re.search(r'(\d{4}-\d{2}-\d{2})', date_str)
-    if ymd_match:
+    # Fast path: the extraction prompts ask for YYYY-MM-DD, so most values are ISO dates
+    if len(date_str) == 10 and date_str[4] == '-' and date_str[7] == '-':
         try:
-            return datetime.strptime(ymd_match.group(1), "%Y-%m-%d").date()
+            return date.fromisoformat(date_str)
         except ValueError:
             pass
 
-    mdy_match = re.search(r'(\d{1,2}/\d{1,2}/\d{4})', date_str)
-    if mdy_match:
-        try:
-            return datetime.strptime(mdy_match.group(1), "%m/%d/%Y").date()
-        except ValueError:
-            pass
+    compact_match = RE_DDMMMYYYY.match(date_str)
+    if compact_match:
+        day, month, year = compact_match.groups()
+        month_number = MONTH_ABBREVIATIONS.get(month.upper())
+        if month_number:
+            try:
+                return date(int(year), month_number, int(day))
+            except ValueError:  # e.g. 31FEB2020
+                pass
+        return None
+
+    # Only formats whose shape fits are handed to strptime, so a typical miss raises no exception
+    for shape, fmt in DATE_FORMAT_SHAPES:
+        if shape.fullmatch(date_str):
+            try:
+                return datetime.strptime(date_str, fmt).date()
+            except ValueError:
+                continue
+
+    # Last attempt: extract date patterns, preferring the first YYYY-MM-DD over the first MM/DD/YYYY
+    embedded = {}
+    for match in RE_EMBEDDED_DATE.finditer(date_str):
+        embedded.setdefault(match.lastgroup, match.group())
+        if len(embedded) == 2:
+            break
+    for kind in ('ymd', 'mdy'):
+        if kind in embedded:
+            try:
+                return datetime.strptime(embedded[kind], EMBEDDED_DATE_FORMATS[kind]).date()
+            except ValueError:
+                pass
 
     return None
 
 
-def get_document_specific_prompt(doc_type: str) -> str:
-    """Get document-specific extraction prompts for all supported document types"""
-
-    prompts = {
-        'I797': """
+# Extraction prompt for each document type; GENERIC covers anything without its own
+DOCUMENT_PROMPTS = {
+    'I797': """
 You are processing an I-797 USCIS Notice of Action (including I-140 approvals, I-129 approvals, etc.). Extract key fields and return as JSON:
 {
     "receipt_number": "string (e.g., IOE0926970247)",
@@ -233,7 +362,7 @@ You are processing an I-797 USCIS Notice of Action (including I-140 approvals, I
 Only include fields that are clearly present. Use null for missing fields.
         """,
 
-        'I797C': """
+    'I797C': """
 You are processing an I-797C Receipt Notice (including I-140 receipt notices, I-129 receipt notices, etc.). Extract key fields and return as JSON:
 {
     "receipt_number": "string (MSC/NBC/EAC/WAC + 10 digits)",
@@ -248,7 +377,7 @@ You are processing an I-797C Receipt Notice (including I-140 receipt notices, I-
 Only include fields that are clearly present. Use null for missing fields.
         """,
 
-        'I129': """
+    'I129': """
 You are processing an I-129 Petition for Nonimmigrant Worker. Extract key fields and return as JSON:
 {
     "family_name": "string (last name)",
@@ -273,7 +402,7 @@ You are processing an I-129 Petition for Nonimmigrant Worker. Extract key fields
 Only include fields that are clearly present. Use null for missing fields.
         """,
 
-        'PWD': """
+    'PWD': """
 You are processing a Prevailing Wage Determination (9141). Extract key fields and return as JSON:
 {
     "expiration_date": "YYYY-MM-DD",
@@ -284,7 +413,7 @@ You are processing a Prevailing Wage Determination (9141). Extract key fields an
 Only include fields that are clearly present. Use null for missing fields.
         """,
 
-        'PERM': """
+    'PERM': """
 You are processing a PERM Labor Certification (9089). Extract key fields and return as JSON:
 {
     "expiration_date": "YYYY-MM-DD",
@@ -295,7 +424,7 @@ You are processing a PERM Labor Certification (9089). Extract key fields and ret
 Only include fields that are clearly present. Use null for missing fields.
         """,
 
-        'LCA': """
+    'LCA': """
 You are processing a Labor Condition Application (LCA/ETA-9035). Extract key fields and return as JSON:
 {
     "job_title": "string",
@@ -319,7 +448,7 @@ You are processing a Labor Condition Application (LCA/ETA-9035). Extract key fie
 Only include fields that are clearly present. Use null for missing fields.
         """,
 
-        'I94': """
+    'I94': """
 You are processing an I-94 Arrival/Departure record. Extract key fields and return as JSON:
 {
     "admission_record_number": "string (11 digits)",
@@ -335,7 +464,7 @@ You are processing an I-94 Arrival/Departure record. Extract key fields and retu
 Only include fields that are clearly present. Use null for missing fields.
         """,
 
-        'EAD': """
+    'EAD': """
 You are processing an Employment Authorization Document (EAD/I-766). Extract key fields and return as JSON:
 {
     "full_name": "string (person's full name)",
@@ -351,7 +480,7 @@ You are processing an Employment Authorization Document (EAD/I-766). Extract key
 Only include fields that are clearly present. Use null for missing fields.
         """,
 
-        'GREEN_CARD': """
+    'GREEN_CARD': """
 You are processing a Permanent Resident Card (Green Card/I-551). Extract key fields and return as JSON:
 {
     "full_name": "string (person's full name)",
@@ -367,7 +496,7 @@ You are processing a Permanent Resident Card (Green Card/I-551). Extract key fie
 Only include fields that are clearly present. Use null for missing fields.
         """,
 
-        'VISA_STAMP': """
+    'VISA_STAMP': """
 You are processing a visa stamp. Extract key fields and return as JSON:
 {
     "issuing_post_name": "string",
@@ -386,7 +515,7 @@ You are processing a visa stamp. Extract key fields and return as JSON:
 Only include fields that are clearly present. Use null for missing fields.
         """,
 
-        'US_PASSPORT': """
+    'US_PASSPORT': """
 You are processing a US passport. Extract key fields and return as JSON:
 {
     "code": "string (country code)",
@@ -400,7 +529,7 @@ You are processing a US passport. Extract key fields and return as JSON:
 Only include fields that are clearly present. Use null for missing fields.
         """,
 
-        'FOREIGN_PASSPORT': """
+    'FOREIGN_PASSPORT': """
 You are processing a foreign passport. Extract key fields and return as JSON:
 {
     "code": "string (country code)",
@@ -415,7 +544,7 @@ You are processing a foreign passport. Extract key fields and return as JSON:
 Only include fields that are clearly present. Use null for missing fields.
         """,
 
-        'GENERIC': """
+    'GENERIC': """
 You are processing an immigration-related document. Extract any key fields and return as JSON:
 {
     "document_type": "string (best guess at document type)",
@@ -428,23 +557,33 @@ You are processing an immigration-related document. Extract any key fields and r
 }
 Only include fields that are clearly present. Use null for missing fields.
         """
-    }
+}
 
-    return prompts.get(doc_type, prompts['GENERIC'])
+
+def get_document_specific_prompt(doc_type: str) -> str:
+    """Get document-specific extraction prompts for all supported document types"""
+    return DOCUMENT_PROMPTS.get(doc_type, DOCUMENT_PROMPTS['GENERIC'])
 
 
 def check_case_completeness(person_data: Dict) -> Dict:
     """Check what documents are present vs. typically needed"""
-    documents = person_data.get('documents', [])
-    doc_types = [doc['type'] for doc in documents]
+    # Types may come back from JSON (cached results); interned, they hash and compare by identity
+    doc_types = frozenset(sys.intern(doc['type']) for doc in person_data.get('documents', []))
+    completeness = completeness_for_types(doc_types)
+    # The cached result is shared; hand each caller its own copy
+    return {**completeness, 'missing_documents': list(completeness['missing_documents'])}
+
 
+@functools.lru_cache(maxsize=256)
+def completeness_for_types(doc_types: frozenset) -> Dict:
+    """Completeness for a set of document types (memoised; people in a batch share a few type sets)"""
     completeness = {
-        'has_petition': any(dt in doc_types for dt in ['I129', 'I797', 'I797C']),
-        'has_labor_cert': any(dt in doc_types for dt in ['PERM', 'LCA']),
-        'has_passport': any('PASSPORT' in dt for dt in doc_types),
+        'has_petition': bool(doc_types & {'I129', 'I797', 'I797C'}),
+        'has_labor_cert': bool(doc_types & {'PERM', 'LCA'}),
+        'has_passport': bool(doc_types & {'US_PASSPORT', 'FOREIGN_PASSPORT'}),
         'has_visa': 'VISA_STAMP' in doc_types,
         'has_entry_record': 'I94' in doc_types,
-        'has_work_auth': any(dt in doc_types for dt in ['EAD', 'GREEN_CARD']),
+        'has_work_auth': bool(doc_types & {'EAD', 'GREEN_CARD'}),
         'missing_documents': [],
         'completeness_score': 0.0
     }
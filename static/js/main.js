@@ -95,6 +95,62 @@ document.addEventListener('DOMContentLoaded', () => {
     }, 150);
   }
 
+  function setProgress(width) {
+    if (!progressBar) return;
+    progressBar.style.width = width + '%';
+    progressBar.setAttribute('aria-valuenow', width);
+  }
+
+  // Background mode: POST the form, then poll /api/progress/<task_id> until the worker finishes
+  async function submitAsync() {
+    try {
+      const response = await fetch(uploadForm.action, { method: 'POST', body: new FormData(uploadForm) });
+      const contentType = response.headers.get('content-type') || '';
+      if (response.redirected || !contentType.includes('application/json')) {
+        // Validation failures redirect to the upload page with a flashed message; fetch already
+        // followed the redirect (consuming the message), so show the page it returned
+        const html = await response.text();
+        if (response.redirected) window.history.replaceState(null, '', response.url);
+        document.open();
+        document.write(html);
+        document.close();
+        return;
+      }
+      if (!response.ok) throw new Error(`Upload failed (${response.status})`);
+      const { task_id: taskId } = await response.json();
+      console.log('Queued processing task:', taskId);
+
+      const poll = async () => {
+        const res = await fetch(`/api/progress/${encodeURIComponent(taskId)}`);
+        if (!res.ok || !(res.headers.get('content-type') || '').includes('application/json')) {
+          alert(`Could not check processing progress (${res.status}).`);
+          window.location.reload();
+          return;
+        }
+        const status = await res.json();
+        setProgress(status.progress || 0);
+        if (status.status === 'complete') {
+          if (status.redirect) {
+            window.location.href = status.redirect;
+          } else {
+            alert(status.error || 'Processing completed, but the results could not be stored.');
+            window.location.reload();
+          }
+        } else if (status.status === 'failed') {
+          alert(`Processing error: ${status.error || 'unknown error'}`);
+          window.location.reload();
+        } else {
+          setTimeout(poll, 2000);
+        }
+      };
+      poll();
+    } catch (err) {
+      console.error(err);
+      alert(err.message);
+      window.location.reload();
+    }
+  }
+
   if (!uploadForm) {
     console.error('Upload form not found (expected id "uploadForm" or "upload-form").');
     return;
@@ -133,6 +189,13 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Visual feedback
     setSubmittingState();
+    if (window.ASYNC_PROCESSING) {
+      e.preventDefault();
+      if (progressContainer) progressContainer.style.display = 'block';
+      setProgress(5);
+      submitAsync();
+      return;
+    }
     if (progressContainer) {
       progressContainer.style.display = 'block';
       startProgressAnimation();
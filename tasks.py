@@ -0,0 +1,38 @@
+import os
+
+from celery import Celery
+from dotenv import load_dotenv
+
+# Load environment variables (the worker imports this module before app.py)
+load_dotenv()
+
+celery_app = Celery(
+    'audit',
+    broker=os.getenv('CELERY_BROKER_URL'),
+    backend=os.getenv('CELERY_RESULT_BACKEND', os.getenv('CELERY_BROKER_URL'))
+)
+
+
+@celery_app.task(bind=True)
+def process_pdf_task(self, file_path, processing_mode, document_type, options):
+    """Process an uploaded PDF in a worker and store the results"""
+    # Imported here so the worker and the web app can share app.py without a circular import
+    from app import app, process_uploaded_file
+
+    def report_stage(stage):
+        self.update_state(state='PROGRESS', meta={'stage': stage})
+
+    try:
+        results = process_uploaded_file(file_path, processing_mode, document_type, options, report_stage)
+    finally:
+        # Clean up uploaded file AFTER processing
+        try:
+            os.remove(file_path)
+        except Exception as cleanup_error:
+            app.logger.warning(f"Failed to clean up file: {cleanup_error}")
+
+    return {
+        'processing_id': results.get('processing_id'),
+        'db_error': results.get('db_error'),
+        'validation_errors': results.get('validation_errors', [])
+    }
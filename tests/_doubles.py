@@ -0,0 +1,23 @@
+"""DocumentProcessor instances for tests that skip client and OCR setup."""
+from models.document_processor import DocumentProcessor, LLM_BATCH_SEGMENTS, LLM_CONCURRENCY
+
+
+def set_bare_attributes(dp):
+    """Give ``dp`` the attributes __init__ and setup_clients would set, with no clients or caches"""
+    dp.llm_deployment = None
+    dp.cache = None
+    dp.cache_ttl = 0
+    dp.memory_cache = None
+    dp.ocr_workers = 1
+    dp.batch_pages = 500
+    dp.llm_batch_segments = LLM_BATCH_SEGMENTS
+    dp.llm_concurrency = LLM_CONCURRENCY
+    dp.ocr_processes = False
+    dp.ocr_process_pool = None
+    dp.race_ocr_fallback = False
+    return dp
+
+
+def bare_processor():
+    """A DocumentProcessor built without running __init__"""
+    return set_bare_attributes(DocumentProcessor.__new__(DocumentProcessor))
@@ -0,0 +1,102 @@
+"""Stand-ins for the heavy external dependencies of models.document_processor.
+
+The module objects are built once, at import; ``install`` registers them in
+``sys.modules`` for every package that has not been imported already.
+"""
+import sys
+import types
+
+# Returned by every stub that yields "no results"; a tuple, so no caller can mutate it
+_NO_RESULTS = ()
+
+
+def _no_results(*args, **kwargs):
+    return _NO_RESULTS
+
+
+# fitz / PyMuPDF
+_fitz = types.ModuleType('fitz')
+
+# easyocr
+_easyocr = types.ModuleType('easyocr')
+class _DummyReader:
+    def __init__(self, *args, **kwargs):
+        pass
+    def readtext(self, *args, **kwargs):
+        return _NO_RESULTS
+_easyocr.Reader = _DummyReader
+
+# numpy
+_numpy = types.ModuleType('numpy')
+_numpy.array = lambda x: x
+
+# pdf2image
+_pdf2image = types.ModuleType('pdf2image')
+_pdf2image.convert_from_path = _no_results
+
+# Azure Form Recognizer stubs
+_azure = types.ModuleType('azure')
+_ai = types.ModuleType('ai')
+_fr = types.ModuleType('formrecognizer')
+class _DummyClient:
+    pass
+_fr.DocumentAnalysisClient = _DummyClient
+_ai.formrecognizer = _fr
+_azure.ai = _ai
+
+_core = types.ModuleType('core')
+_cred = types.ModuleType('credentials')
+class _DummyCred:
+    def __init__(self, *args, **kwargs):
+        pass
+_cred.AzureKeyCredential = _DummyCred
+_core.credentials = _cred
+_azure.core = _core
+
+# OpenAI (AzureOpenAI) stub
+_openai = types.ModuleType('openai')
+# Every stubbed completion is the same empty JSON object, so the response is built once
+_OPENAI_STUB_RESPONSE = types.SimpleNamespace(
+    choices=[types.SimpleNamespace(message=types.SimpleNamespace(content="{}"))]
+)
+class _DummyOpenAI:
+    def __init__(self, *args, **kwargs):
+        pass
+    class chat:
+        class completions:
+            @staticmethod
+            def create(*args, **kwargs):
+                return _OPENAI_STUB_RESPONSE
+_openai.AzureOpenAI = _DummyOpenAI
+
+# ratelimit stub
+_ratelimit = types.ModuleType('ratelimit')
+def limits(calls, period):
+    def decorator(func):
+        return func
+    return decorator
+def sleep_and_retry(func):
+    return func
+_ratelimit.limits = limits
+_ratelimit.sleep_and_retry = sleep_and_retry
+
+# Import name -> stub module
+STUB_MODULES = {
+    'fitz': _fitz,
+    'easyocr': _easyocr,
+    'numpy': _numpy,
+    'pdf2image': _pdf2image,
+    'azure': _azure,
+    'azure.ai': _ai,
+    'azure.ai.formrecognizer': _fr,
+    'azure.core': _core,
+    'azure.core.credentials': _cred,
+    'openai': _openai,
+    'ratelimit': _ratelimit,
+}
+
+
+def install():
+    """Register the stubs, leaving any module that is already imported in place"""
+    for name, module in STUB_MODULES.items():
+        sys.modules.setdefault(name, module)
@@ -0,0 +1,5 @@
+# pytest puts this directory on sys.path before importing conftest
+import _stubs
+
+# Installed here, before any test module imports models.document_processor
+_stubs.install()
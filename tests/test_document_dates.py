@@ -1,80 +1,9 @@
-import os
-import sys
-import types
-import pytest
-
-sys.modules['fitz'] = types.ModuleType('fitz')
-
-easyocr_mod = types.ModuleType('easyocr')
-class DummyReader:
-    def __init__(self, *args, **kwargs):
-        pass
-    def readtext(self, *args, **kwargs):
-        return []
-easyocr_mod.Reader = DummyReader
-sys.modules['easyocr'] = easyocr_mod
-
-numpy_mod = types.ModuleType('numpy')
-numpy_mod.array = lambda x: x
-sys.modules['numpy'] = numpy_mod
-
-pdf2image_mod = types.ModuleType('pdf2image')
-pdf2image_mod.convert_from_path = lambda *args, **kwargs: []
-sys.modules['pdf2image'] = pdf2image_mod
-
-azure_mod = types.ModuleType('azure')
-azure_ai = types.ModuleType('ai')
-fr_mod = types.ModuleType('formrecognizer')
-class DummyClient:
-    pass
-fr_mod.DocumentAnalysisClient = DummyClient
-azure_ai.formrecognizer = fr_mod
-azure_mod.ai = azure_ai
-azure_core = types.ModuleType('core')
-cred_mod = types.ModuleType('credentials')
-class DummyCred:
-    def __init__(self, *args, **kwargs):
-        pass
-cred_mod.AzureKeyCredential = DummyCred
-azure_core.credentials = cred_mod
-azure_mod.core = azure_core
-sys.modules['azure'] = azure_mod
-sys.modules['azure.ai'] = azure_ai
-sys.modules['azure.ai.formrecognizer'] = fr_mod
-sys.modules['azure.core'] = azure_core
-sys.modules['azure.core.credentials'] = cred_mod
-
-openai_mod = types.ModuleType('openai')
-class DummyOpenAI:
-    def __init__(self, *args, **kwargs):
-        pass
-    class chat:
-        class completions:
-            @staticmethod
-            def create(*args, **kwargs):
-                return {}
-openai_mod.AzureOpenAI = DummyOpenAI
-sys.modules['openai'] = openai_mod
-
-ratelimit_mod = types.ModuleType('ratelimit')
-def limits(calls, period):
-    def decorator(func):
-        return func
-    return decorator
-def sleep_and_retry(func):
-    return func
-ratelimit_mod.limits = limits
-ratelimit_mod.sleep_and_retry = sleep_and_retry
-sys.modules['ratelimit'] = ratelimit_mod
-
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
-from models.document_processor import DocumentProcessor
+from _doubles import bare_processor
 from models.validators import parse_date_flexible
 
 
 def test_consolidate_person_data_skips_invalid_dates_and_sorts():
-    dp = DocumentProcessor.__new__(DocumentProcessor)
+    dp = bare_processor()
     person_records = {}
     segment_valid = {
         'extracted_data': {
@@ -102,8 +31,23 @@ def test_consolidate_person_data_skips_invalid_dates_and_sorts():
     assert timeline[0]['parsed_date'].isoformat() == '2024-01-01'
 
 
+def test_consolidate_person_data_merges_name_and_dob_variants():
+    dp = bare_processor()
+    person_records = {}
+    for name, dob in [('Juan Pérez', '01/02/1990'), ('JUAN  PEREZ', '1990-01-02')]:
+        segment = {
+            'extracted_data': {'beneficiary': name, 'date_of_birth': dob},
+            'document_type': 'I797',
+            'pages': [1],
+        }
+        dp.consolidate_person_data(segment, person_records)
+
+    assert list(person_records) == ['Juan Pérez_01/02/1990']
+    assert len(person_records['Juan Pérez_01/02/1990']['documents']) == 2
+
+
 def test_get_document_date_range_handles_mixed_dates():
-    dp = DocumentProcessor.__new__(DocumentProcessor)
+    dp = bare_processor()
     results = {
         'person_records': {
             'p1': {
@@ -131,3 +75,20 @@ def test_get_document_date_range_handles_mixed_dates():
     date_range = dp.get_document_date_range(results)
     assert date_range['earliest'] == '1994-12-19'
     assert date_range['latest'] == '2024-01-01'
+
+
+def test_consistency_check_ignores_case_and_date_format_but_keeps_extracted_values():
+    dp = bare_processor()
+    person_records = {}
+    for name, dob, country in [('John Doe', '01/02/1990', 'usa'), ('JOHN  DOE', '1990-01-02', 'USA')]:
+        segment = {
+            'extracted_data': {'beneficiary': name, 'date_of_birth': dob, 'country_of_birth': country},
+            'document_type': 'I797',
+            'pages': [1],
+        }
+        dp.consolidate_person_data(segment, person_records)
+
+    record = person_records['John Doe_01/02/1990']
+    assert record['inconsistencies'] == []
+    assert record['documents'][0]['data']['beneficiary'] == 'John Doe'
+    assert record['documents'][0]['identity_fields']['beneficiary'] == 'JOHN DOE'
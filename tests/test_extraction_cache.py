@@ -0,0 +1,82 @@
+import types
+
+from _doubles import bare_processor
+from models.document_processor import DocumentSegment
+from models.extraction_cache import ExtractionCache
+
+
+def test_extraction_cache_evicts_least_recently_used():
+    cache = ExtractionCache(2)
+    cache.set('a', b'1')
+    cache.set('b', b'2')
+    assert cache.get('a') == b'1'  # 'a' is now the most recently used
+
+    cache.set('c', b'3')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1'
+    assert cache.get('c') == b'3'
+    assert len(cache) == 2
+
+
+def test_extraction_cache_disabled_with_zero_size():
+    cache = ExtractionCache(0)
+    cache.set('a', b'1')
+    assert cache.get('a') is None
+
+
+def test_extract_with_llm_serves_repeated_text_from_memory():
+    dp = bare_processor()
+    dp.memory_cache = ExtractionCache(8)
+    calls = []
+
+    def fake_llm(messages):
+        calls.append(messages)
+        message = types.SimpleNamespace(content='{"receipt_number": "WAC1234567890"}')
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+    dp.throttled_llm = fake_llm
+
+    first = dp.extract_with_llm("Receipt Number WAC1234567890", "prompt")
+    second = dp.extract_with_llm("Receipt Number WAC1234567890", "prompt")
+
+    assert len(calls) == 1
+    assert first == second == {"receipt_number": "WAC1234567890"}
+    assert first is not second
+
+
+def test_extract_with_llm_does_not_cache_empty_results():
+    dp = bare_processor()
+    dp.memory_cache = ExtractionCache(8)
+    calls = []
+
+    def fake_llm(messages):
+        calls.append(messages)
+        message = types.SimpleNamespace(content='')
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+    dp.throttled_llm = fake_llm
+
+    assert dp.extract_with_llm("garbled", "prompt") == {}
+    assert dp.extract_with_llm("garbled", "prompt") == {}
+    assert len(calls) == 2
+    assert len(dp.memory_cache) == 0
+
+
+def test_batched_extraction_retries_segments_missing_from_reply():
+    dp = bare_processor()
+    dp.memory_cache = ExtractionCache(8)
+    dp.llm_deployment = "test"
+    dp.llm_concurrency = 1
+
+    def fake_llm(messages, response_format=None):
+        # The reply leaves out segment 2's fields
+        content = '{"segments": [{"segment": 1, "fields": {"i94_number": "12345678901"}}, {"segment": 2}]}'
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+    dp.throttled_llm = fake_llm
+
+    segments = [
+        DocumentSegment([0], 'I94', 0.90, 'I-94 Arrival/Departure Record\nI-94 Number: 12345678901'),
+        DocumentSegment([1], 'I94', 0.90, 'I-94 Arrival/Departure Record\nName: Jane Smith'),
+    ]
+
+    assert dp.extract_segments_batched(segments) == [{"i94_number": "12345678901"}, None]
+    assert len(dp.memory_cache) == 1
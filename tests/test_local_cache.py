@@ -0,0 +1,30 @@
+from contextlib import closing
+
+from models.local_cache import SQLiteCache
+
+
+def test_sqlite_cache_round_trip(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'nested' / 'cache.sqlite3'))
+    assert cache.get('missing') is None
+
+    cache.setex('key', 60, b'{"a":1}')
+    assert cache.get('key') == b'{"a":1}'
+
+    cache.setex('key', 60, b'{"a":2}')
+    assert cache.get('key') == b'{"a":2}'
+
+
+def test_sqlite_cache_expires_entries(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite3'))
+    cache.setex('key', -1, b'stale')
+    assert cache.get('key') is None
+
+
+def test_sqlite_cache_purges_expired_rows_on_write(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite3'))
+    cache.setex('stale', -1, b'old')
+    cache.setex('fresh', 60, b'new')
+
+    with closing(cache.connect()) as conn:
+        keys = [row[0] for row in conn.execute('SELECT key FROM cache')]
+    assert keys == ['fresh']
@@ -1,114 +1,67 @@
-import os
-import sys
-import types
 import re
+import threading
 import pytest
 
-# --- Stub external dependencies to keep tests lightweight ---
-
-# fitz / PyMuPDF
-sys.modules['fitz'] = types.ModuleType('fitz')
-
-# easyocr
-_easyocr = types.ModuleType('easyocr')
-class _DummyReader:
-    def __init__(self, *args, **kwargs):
-        pass
-    def readtext(self, *args, **kwargs):
-        return []
-_easyocr.Reader = _DummyReader
-sys.modules['easyocr'] = _easyocr
-
-# numpy
-_numpy = types.ModuleType('numpy')
-_numpy.array = lambda x: x
-sys.modules['numpy'] = _numpy
-
-# pdf2image
-_pdf2image = types.ModuleType('pdf2image')
-_pdf2image.convert_from_path = lambda *args, **kwargs: []
-sys.modules['pdf2image'] = _pdf2image
-
-# Azure Form Recognizer stubs
-_azure = types.ModuleType('azure')
-_ai = types.ModuleType('ai')
-_fr = types.ModuleType('formrecognizer')
-class _DummyClient:
-    pass
-_fr.DocumentAnalysisClient = _DummyClient
-_ai.formrecognizer = _fr
-_azure.ai = _ai
-
-_core = types.ModuleType('core')
-_cred = types.ModuleType('credentials')
-class _DummyCred:
-    def __init__(self, *args, **kwargs):
-        pass
-_cred.AzureKeyCredential = _DummyCred
-_core.credentials = _cred
-_azure.core = _core
-
-sys.modules['azure'] = _azure
-sys.modules['azure.ai'] = _ai
-sys.modules['azure.ai.formrecognizer'] = _fr
-sys.modules['azure.core'] = _core
-sys.modules['azure.core.credentials'] = _cred
-
-# OpenAI (AzureOpenAI) stub
-_openai = types.ModuleType('openai')
-class _DummyOpenAI:
-    def __init__(self, *args, **kwargs):
-        pass
-    class chat:
-        class completions:
-            @staticmethod
-            def create(*args, **kwargs):
-                msg = types.SimpleNamespace(content="{}")
-                choice = types.SimpleNamespace(message=msg)
-                return types.SimpleNamespace(choices=[choice])
-_openai.AzureOpenAI = _DummyOpenAI
-sys.modules['openai'] = _openai
-
-# ratelimit stub
-_ratelimit = types.ModuleType('ratelimit')
-def limits(calls, period):
-    def decorator(func):
-        return func
-    return decorator
-def sleep_and_retry(func):
-    return func
-_ratelimit.limits = limits
-_ratelimit.sleep_and_retry = sleep_and_retry
-sys.modules['ratelimit'] = _ratelimit
-
-# Make project package importable (adjust if your tree differs)
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
+from _doubles import bare_processor, set_bare_attributes
 from models.document_processor import DocumentProcessor, DocumentSegment
 
+# Receipt numbers found by the fake LLM extraction. ASCII matching keeps \s cheap; the
+# non-breaking space OCR sometimes emits is listed explicitly so it still separates
+# label and value.
+_RECEIPT_RE = re.compile(r"Receipt Number[\s\xa0]+([A-Z0-9]+)", re.ASCII)
+
+
+def _extract_prefixed(text, prefix):
+    """Trimmed first line after ``prefix`` (skipping blank space), or None"""
+    idx = text.find(prefix)
+    if idx < 0:
+        return None
+    value = text[idx + len(prefix):].lstrip().split("\n", 1)[0].strip()
+    return value or None
+
+
+# Segments returned by _LLMStubDP, built once and shared (processing only reads them)
+_I797_TEXT = (
+    "I-797 Notice of Action\n"
+    "Receipt Number ABC1234567890\n"
+    "Beneficiary: John Doe"
+)
+_I94_TEXT = (
+    "I-94 Arrival/Departure Record\n"
+    "Name: John Doe"
+)
+_SEG_I797 = DocumentSegment(pages=[0], doc_type="I797", confidence=0.95, text=_I797_TEXT)
+_SEG_I94 = DocumentSegment(pages=[1], doc_type="I94", confidence=0.90, text=_I94_TEXT)
+
+
+# ---------- Fixtures ----------
+@pytest.fixture(scope="session")
+def sample_pdf(tmp_path_factory):
+    """Tiny placeholder PDF, written once per session (the tests never read its contents)."""
+    path = tmp_path_factory.mktemp("pdfs") / "sample.pdf"
+    path.write_bytes(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n1 0 obj\n<<>>\nendobj\ntrailer\n<<>>\n%%EOF')
+    return path
 
-# ---------- Helpers ----------
-def create_sample_pdf(tmp_path):
-    """Create a tiny placeholder PDF file."""
-    pdf_path = tmp_path / 'sample.pdf'
-    pdf_path.write_bytes(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n1 0 obj\n<<>>\nendobj\ntrailer\n<<>>\n%%EOF')
-    return pdf_path
 
+# ---------- Test doubles ----------
+class _FakeDP(DocumentProcessor):
+    """DocumentProcessor without clients or OCR setup; subclasses fake one layer each."""
 
-# ---------- Tests (version A: stubbing process_document_segment) ----------
-def test_multi_document_processing(tmp_path):
-    pdf_path = create_sample_pdf(tmp_path)
+    def __init__(self):
+        set_bare_attributes(self)
 
-    dp = DocumentProcessor.__new__(DocumentProcessor)
 
-    def fake_analyze(_):
+class _SegmentStubDP(_FakeDP):
+    """Fakes page analysis and per-segment processing (version A)."""
+
+    def analyze_pdf_by_pages(self, file_path):
         seg1 = DocumentSegment([1], 'I797', 0.95,
                                'NOTICE OF ACTION\nReceipt Number WAC1234567890\nBeneficiary: John Doe')
         seg2 = DocumentSegment([2], 'I94', 0.90,
                                'I-94 Arrival/Departure Record\nName: Jane Smith\nI-94 Number: 12345678901')
-        return [seg1, seg2]
+        return [seg1, seg2], []
 
-    def fake_process_segment(segment, options):
+    def process_document_segment(self, segment, options, extracted_data=None):
         if segment.doc_type == 'I797':
             data = {'receipt_number': 'WAC1234567890', 'beneficiary': 'John Doe'}
         elif segment.doc_type == 'I94':
@@ -124,11 +77,75 @@ def test_multi_document_processing(tmp_path):
             'processing_notes': []
         }
 
-    dp.analyze_pdf_by_pages = fake_analyze
-    dp.process_document_segment = fake_process_segment
-    dp.generate_audit_summary = lambda results: {}
+    def generate_audit_summary(self, results):
+        return {}
+
+
+class _LLMStubDP(_FakeDP):
+    """Fakes page analysis and the LLM call, so real segment processing runs (version B)."""
 
-    results = dp.process_multi_document_file(str(pdf_path))
+    def analyze_pdf_by_pages(self, file_path):
+        return [_SEG_I797, _SEG_I94], []
+
+    def extract_with_llm(self, text, prompt):
+        data = {}
+        m = _RECEIPT_RE.search(text)
+        if m:
+            data["receipt_number"] = m.group(1)
+        beneficiary = _extract_prefixed(text, "Beneficiary:")
+        if beneficiary:
+            data["beneficiary"] = beneficiary
+        else:
+            name = _extract_prefixed(text, "Name:")
+            if name:
+                data["name"] = name
+        return data
+
+
+class _RendezvousSegmentDP(_SegmentStubDP):
+    """Segment processing that only completes once all four segments are in flight together."""
+
+    def __init__(self):
+        super().__init__()
+        self.llm_concurrency = 4
+        # Broken (raising in every waiter) if the segments are processed one at a time
+        self.rendezvous = threading.Barrier(4, timeout=10)
+
+    def analyze_pdf_by_pages(self, file_path):
+        segments = [DocumentSegment([page], 'I94', 0.90, 'I-94 Arrival/Departure Record') for page in range(4)]
+        return segments, []
+
+    def process_document_segment(self, segment, options, extracted_data=None):
+        self.rendezvous.wait()
+        return super().process_document_segment(segment, options, extracted_data)
+
+
+# ---------- Tests (fake LLM extraction) ----------
+def test_fake_extraction_handles_non_breaking_spaces():
+    text = "Receipt Number\xa0ABC1234567890\nBeneficiary:\xa0John Doe"
+    assert _LLMStubDP().extract_with_llm(text, "prompt") == {
+        "receipt_number": "ABC1234567890",
+        "beneficiary": "John Doe",
+    }
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Name: John Doe", "John Doe"),
+    ("Name:John Doe  \nI-94 Number: 1", "John Doe"),
+    ("Name:\n  John Doe\n", "John Doe"),
+    ("Name:\xa0John Doe", "John Doe"),
+    ("Name:   ", None),
+    ("No label here", None),
+])
+def test_extract_prefixed_whitespace(text, expected):
+    assert _extract_prefixed(text, "Name:") == expected
+
+
+# ---------- Tests (version A: stubbing process_document_segment) ----------
+def test_multi_document_processing(sample_pdf):
+    dp = _SegmentStubDP()
+
+    results = dp.process_multi_document_file(str(sample_pdf))
 
     assert results['segments_found'] > 0
     doc_types = [doc['document_type'] for doc in results['documents_processed']]
@@ -139,46 +156,30 @@ def test_multi_document_processing(tmp_path):
                for doc in results['documents_processed'])
 
 
-# ---------- Tests (version B: stubbing extract_with_llm) ----------
-@pytest.fixture
-def sample_pdf(tmp_path):
-    path = tmp_path / "sample.pdf"
-    path.write_bytes(b"%PDF-1.1\n%EOF")
-    return path
+def test_process_multi_document_file_processes_segments_concurrently(sample_pdf):
+    dp = _RendezvousSegmentDP()
+
+    results = dp.process_multi_document_file(str(sample_pdf))
+
+    assert results['validation_errors'] == []
+    assert not dp.rendezvous.broken
+    assert [doc['pages'] for doc in results['documents_processed']] == [[0], [1], [2], [3]]
+
+
+def test_group_pages_handles_leading_continuation_page():
+    dp = bare_processor()
+    page = {'page_num': 0, 'detected_types': [], 'is_continuation': True, 'text': 'continued from previous page'}
+
+    segments = dp.group_pages_into_documents([page])
 
+    assert len(segments) == 1
+    assert segments[0].pages == [0]
+    assert segments[0].doc_type is None
 
+
+# ---------- Tests (version B: stubbing extract_with_llm) ----------
 def test_process_multi_document_file(sample_pdf):
-    dp = DocumentProcessor.__new__(DocumentProcessor)
-
-    def fake_analyze(self, file_path):
-        text1 = (
-            "I-797 Notice of Action\n"
-            "Receipt Number ABC1234567890\n"
-            "Beneficiary: John Doe"
-        )
-        text2 = (
-            "I-94 Arrival/Departure Record\n"
-            "Name: John Doe"
-        )
-        return [
-            DocumentSegment(pages=[0], doc_type="I797", confidence=0.95, text=text1),
-            DocumentSegment(pages=[1], doc_type="I94", confidence=0.90, text=text2),
-        ]
-    dp.analyze_pdf_by_pages = fake_analyze.__get__(dp, DocumentProcessor)
-
-    def fake_extract_with_llm(self, text, prompt):
-        data = {}
-        m = re.search(r"Receipt Number\s+([A-Z0-9]+)", text)
-        if m:
-            data["receipt_number"] = m.group(1)
-        m = re.search(r"Beneficiary:\s*(.+)", text)
-        if m:
-            data["beneficiary"] = m.group(1).strip()
-        m = re.search(r"Name:\s*(.+)", text)
-        if m and "beneficiary" not in data:
-            data["name"] = m.group(1).strip()
-        return data
-    dp.extract_with_llm = fake_extract_with_llm.__get__(dp, DocumentProcessor)
+    dp = _LLMStubDP()
 
     results = dp.process_multi_document_file(str(sample_pdf))
 
@@ -191,3 +192,14 @@ def test_process_multi_document_file(sample_pdf):
 
     i94 = next(seg for seg in results["documents_processed"] if seg["document_type"] == "I94")
     assert i94["extracted_data"]["name"] == "John Doe"
+
+
+def test_process_multi_document_file_leaves_segments_unchanged(sample_pdf):
+    # The shared _SEG_* constants are only safe to reuse if processing never mutates a segment
+    fields = ('pages', 'doc_type', 'confidence', 'text', 'extracted_data')
+    before = [{name: repr(getattr(seg, name)) for name in fields} for seg in (_SEG_I797, _SEG_I94)]
+
+    _LLMStubDP().process_multi_document_file(str(sample_pdf))
+
+    after = [{name: repr(getattr(seg, name)) for name in fields} for seg in (_SEG_I797, _SEG_I94)]
+    assert after == before